@@ -4,7 +4,10 @@ import os
 from datetime import datetime
 import requests
 from bs4 import BeautifulSoup
-import hashlib
+
+from precompute_answers import trigger_precompute
+from kb_store import get_kb_store
+from version_store import get_version_store
 
 # Page config
 st.set_page_config(
@@ -15,9 +18,9 @@ st.set_page_config(
 
 # File paths
 KNOWLEDGE_BASE_DIR = "knowledge_base"
-VERSIONS_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "versions.json")
 CURRENT_KB_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "current_knowledge.json")
 SYNC_CONFIG_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "sync_config.json")
+VERSIONS_PER_PAGE = 20
 
 # Create directory if not exists
 os.makedirs(KNOWLEDGE_BASE_DIR, exist_ok=True)
@@ -27,6 +30,10 @@ if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 if 'edit_mode' not in st.session_state:
     st.session_state.edit_mode = False
+if 'view_version' not in st.session_state:
+    st.session_state.view_version = None
+if 'diff_versions' not in st.session_state:
+    st.session_state.diff_versions = None
 
 # Authentication - Load from secrets or environment variable
 ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD", os.getenv("ADMIN_PASSWORD", "change-this-password"))
@@ -51,58 +58,33 @@ def authenticate():
 
 def load_knowledge_base():
     """Load current knowledge base"""
-    if os.path.exists(CURRENT_KB_FILE):
-        with open(CURRENT_KB_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {
-        "sections": [],
-        "last_updated": None,
-        "version": "1.0.0"
-    }
+    return get_kb_store().load()
+
+def save_knowledge_base(kb_data=None, commit_message="", update=None):
+    """Save knowledge base with versioning and auto-commit via GitHub API
 
-def save_knowledge_base(kb_data, commit_message=""):
-    """Save knowledge base with versioning and auto-commit via GitHub API"""
+    update: optional callable(store) -> kb_data applying a single-section
+    change in the store's own transaction instead of rewriting kb_data
+    """
     import base64
     
-    # Generate version hash
-    content_hash = hashlib.md5(json.dumps(kb_data, sort_keys=True).encode()).hexdigest()[:8]
-    
-    # Load version history
-    versions = load_versions()
-    
-    # Create new version
-    version_number = len(versions) + 1
-    version_data = {
-        "version": f"{version_number}.0.0",
-        "hash": content_hash,
-        "timestamp": datetime.now().isoformat(),
-        "commit_message": commit_message,
-        "data": kb_data
-    }
-    
-    # Save version locally
-    version_file = os.path.join(KNOWLEDGE_BASE_DIR, f"version_{version_number}_{content_hash}.json")
-    with open(version_file, 'w', encoding='utf-8') as f:
-        json.dump(version_data, f, indent=2, ensure_ascii=False)
+    store = get_kb_store()
+    if update is not None:
+        kb_data = update(store)
     
-    # Update versions list
-    versions.append({
-        "version": version_data["version"],
-        "hash": content_hash,
-        "timestamp": version_data["timestamp"],
-        "commit_message": commit_message,
-        "file": version_file
-    })
-    
-    with open(VERSIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(versions, f, indent=2, ensure_ascii=False)
+    # Save version (deduplicated section blobs + manifest; old versions pruned)
+    version_data = get_version_store().commit(kb_data, commit_message)
     
     # Update current knowledge base
-    kb_data["last_updated"] = datetime.now().isoformat()
-    kb_data["version"] = version_data["version"]
+    meta = {"last_updated": datetime.now().isoformat(), "version": version_data["version"]}
+    if update is not None:
+        store.set_meta(**meta)
+    else:
+        kb_data.update(meta)
+        store.save(kb_data)
     
-    with open(CURRENT_KB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(kb_data, f, indent=2, ensure_ascii=False)
+    # Precompute example-question answers for the new version in the background
+    trigger_precompute(st.secrets.get("GEMINI_API_KEY", os.getenv("GEMINI_API_KEY")))
     
     # Auto-commit to GitHub via API
     github_token = st.secrets.get("GITHUB_TOKEN", os.getenv("GITHUB_TOKEN"))
@@ -162,24 +144,19 @@ def save_knowledge_base(kb_data, commit_message=""):
         st.info("ℹ️ Changes saved locally. Add GITHUB_TOKEN to Streamlit Secrets to enable auto-push to GitHub.")
     
     return version_data["version"]
-    
-    return version_data["version"]
 
 def load_versions():
     """Load version history"""
-    if os.path.exists(VERSIONS_FILE):
-        with open(VERSIONS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+    return get_version_store().load_versions()
 
 def restore_version(version_file):
     """Restore knowledge base from a specific version"""
-    with open(version_file, 'r', encoding='utf-8') as f:
-        version_data = json.load(f)
+    kb_data = get_version_store().load_version(version_file)
     
     # Save as current
-    with open(CURRENT_KB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(version_data["data"], f, indent=2, ensure_ascii=False)
+    get_kb_store().save(kb_data)
+    
+    trigger_precompute(st.secrets.get("GEMINI_API_KEY", os.getenv("GEMINI_API_KEY")))
     
     return True
 
@@ -227,6 +204,64 @@ def save_sync_config(config):
     with open(SYNC_CONFIG_FILE, 'w', encoding='utf-8') as f:
         json.dump(config, f, indent=2, ensure_ascii=False)
 
+def filter_versions(versions, query="", source="All"):
+    """Newest-first versions matching a search text and source (index metadata only)"""
+    query = query.strip().lower()
+    matches = []
+    for version in reversed(versions):
+        if source == "Manual" and version.get("source") == "sync":
+            continue
+        if source == "Auto-Sync" and version.get("source") != "sync":
+            continue
+        if query:
+            changes = version.get("changes", {})
+            haystack = " ".join(
+                [version.get("version", ""), version.get("commit_message", "")]
+                + [title for titles in changes.values() for title in titles]
+            ).lower()
+            if query not in haystack:
+                continue
+        matches.append(version)
+    return matches
+
+def format_changes(changes):
+    """One-line summary like '+1 added, ~2 modified'"""
+    parts = [
+        f"{symbol}{len(changes.get(kind, []))} {kind}"
+        for kind, symbol in (("added", "+"), ("modified", "~"), ("removed", "-"))
+        if changes.get(kind)
+    ]
+    return ", ".join(parts) or "no section changes"
+
+def render_version_diff(old_version, new_version):
+    """Show added, removed and modified sections between two versions"""
+    diff = get_version_store().diff(old_version['file'], new_version['file'])
+    st.write(
+        f"**{len(diff['added'])}** added · **{len(diff['modified'])}** modified · "
+        f"**{len(diff['removed'])}** removed"
+    )
+    if not any(diff.values()):
+        st.info("No section changes between these versions.")
+    
+    for section in diff["added"]:
+        with st.expander(f"➕ {section.get('title', 'Untitled')}"):
+            st.text(section.get("content", ""))
+    for section in diff["removed"]:
+        with st.expander(f"➖ {section.get('title', 'Untitled')}"):
+            st.text(section.get("content", ""))
+    for change in diff["modified"]:
+        title = change["title"]
+        if change["old_title"] != title:
+            title = f"{change['old_title']} → {title}"
+        with st.expander(f"✏️ {title}"):
+            if change["diff"]:
+                st.code("\n".join(change["diff"]), language="diff")
+            else:
+                st.write("Content unchanged.")
+            other_fields = [field for field in change["fields"] if field != "title"]
+            if other_fields:
+                st.caption("Changed fields: " + ", ".join(other_fields))
+
 def export_to_text(kb_data):
     """Export knowledge base to text format for app.py"""
     text_content = "INFORMASI BANK INDONESIA KANTOR PERWAKILAN PURWOKERTO\n\n"
@@ -294,16 +329,16 @@ def main():
                 with col1:
                     if st.form_submit_button("💾 Save Section"):
                         if new_title and new_content:
-                            if "sections" not in kb_data:
-                                kb_data["sections"] = []
-                            
-                            kb_data["sections"].append({
+                            new_section = {
                                 "title": new_title,
                                 "content": new_content,
                                 "created_at": datetime.now().isoformat()
-                            })
+                            }
                             
-                            version = save_knowledge_base(kb_data, f"Added section: {new_title}")
+                            version = save_knowledge_base(
+                                commit_message=f"Added section: {new_title}",
+                                update=lambda store: store.add_section(new_section)
+                            )
                             st.success(f"✅ Section saved! Version: {version}")
                             st.warning("⚠️ Git auto-push tidak tersedia di Streamlit Cloud. Silakan download file dan commit manual ke GitHub.")
                             st.session_state.edit_mode = False
@@ -331,18 +366,25 @@ def main():
                         col1, col2 = st.columns(2)
                         with col1:
                             if st.form_submit_button("💾 Update"):
-                                kb_data["sections"][idx]["title"] = title
-                                kb_data["sections"][idx]["content"] = content
-                                kb_data["sections"][idx]["updated_at"] = datetime.now().isoformat()
+                                fields = {
+                                    "title": title,
+                                    "content": content,
+                                    "updated_at": datetime.now().isoformat()
+                                }
                                 
-                                version = save_knowledge_base(kb_data, f"Updated section: {title}")
+                                version = save_knowledge_base(
+                                    commit_message=f"Updated section: {title}",
+                                    update=lambda store: store.update_section(idx, fields)
+                                )
                                 st.success(f"✅ Section updated! Version: {version}")
                                 st.rerun()
                         
                         with col2:
                             if st.form_submit_button("🗑️ Delete"):
-                                kb_data["sections"].pop(idx)
-                                version = save_knowledge_base(kb_data, f"Deleted section: {section.get('title')}")
+                                version = save_knowledge_base(
+                                    commit_message=f"Deleted section: {section.get('title')}",
+                                    update=lambda store: store.delete_section(idx)
+                                )
                                 st.success(f"✅ Section deleted! Version: {version}")
                                 st.rerun()
     
@@ -355,15 +397,49 @@ def main():
         if not versions:
             st.info("No version history available yet.")
         else:
-            st.write(f"**Total Versions:** {len(versions)}")
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                query = st.text_input("🔍 Search commit messages or section titles", key="version_query")
+            with col2:
+                source = st.selectbox("Source", ["All", "Manual", "Auto-Sync"], key="version_source")
             
-            for version in reversed(versions):
-                with st.expander(f"Version {version['version']} - {version['timestamp'][:19]}"):
+            # Compare any two versions
+            with st.expander("🔀 Compare Versions"):
+                labels = [f"{v['version']} - {v['timestamp'][:19]}" for v in reversed(versions)]
+                col1, col2 = st.columns(2)
+                with col1:
+                    old_label = st.selectbox("From", labels, index=min(1, len(labels) - 1), key="diff_from")
+                with col2:
+                    new_label = st.selectbox("To", labels, index=0, key="diff_to")
+                if st.button("Show Diff", key="show_diff"):
+                    newest_first = list(reversed(versions))
+                    st.session_state.diff_versions = (
+                        newest_first[labels.index(old_label)], newest_first[labels.index(new_label)]
+                    )
+            
+            matches = filter_versions(versions, query, source)
+            page_count = max(1, -(-len(matches) // VERSIONS_PER_PAGE))
+            if st.session_state.get("version_page", 1) > page_count:
+                st.session_state.version_page = page_count  # filter shrank the result
+            # No value= here: the page is owned by session state (defaults to min_value)
+            page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="version_page")
+            st.write(f"**Total Versions:** {len(versions)} · **Matching:** {len(matches)} · Page {page}/{page_count}")
+            
+            # Only the index is rendered; snapshot bodies are loaded on demand
+            positions = {version['file']: i for i, version in enumerate(versions)}
+            for version in matches[(page - 1) * VERSIONS_PER_PAGE:page * VERSIONS_PER_PAGE]:
+                changes = version.get("changes", {})
+                with st.expander(f"Version {version['version']} - {version['timestamp'][:19]} - {format_changes(changes)}"):
                     st.write(f"**Hash:** `{version['hash']}`")
                     st.write(f"**Commit Message:** {version.get('commit_message', 'No message')}")
                     st.write(f"**Timestamp:** {version['timestamp']}")
+                    if "sections" in version:
+                        st.write(f"**Sections:** {version['sections']} · **Size:** {version.get('size', 0) / 1024:.1f} KB · **Source:** {version.get('source', 'admin')}")
+                    for kind in ("added", "modified", "removed"):
+                        if changes.get(kind):
+                            st.write(f"**{kind.capitalize()}:** " + ", ".join(changes[kind]))
                     
-                    col1, col2 = st.columns(2)
+                    col1, col2, col3 = st.columns(3)
                     with col1:
                         if st.button("🔄 Restore This Version", key=f"restore_{version['version']}"):
                             if restore_version(version['file']):
@@ -372,9 +448,42 @@ def main():
                     
                     with col2:
                         if st.button("👁️ View Details", key=f"view_{version['version']}"):
-                            with open(version['file'], 'r', encoding='utf-8') as f:
-                                data = json.load(f)
-                                st.json(data)
+                            st.session_state.view_version = version
+                    
+                    with col3:
+                        position = positions[version['file']]
+                        if position > 0 and st.button("🔀 Compare with Previous", key=f"diff_{version['version']}"):
+                            st.session_state.diff_versions = (versions[position - 1], version)
+            
+            diff_pair = st.session_state.diff_versions
+            if diff_pair:
+                st.markdown("---")
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.subheader(f"Changes {diff_pair[0]['version']} → {diff_pair[1]['version']}")
+                with col2:
+                    if st.button("✖️ Close", key="close_diff_versions"):
+                        st.session_state.diff_versions = None
+                        st.rerun()
+                try:
+                    render_version_diff(*diff_pair)
+                except FileNotFoundError:
+                    st.error("Version file not found (it may have been pruned).")
+            
+            viewed = st.session_state.view_version
+            if viewed:
+                st.markdown("---")
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.subheader(f"Version {viewed['version']} content")
+                with col2:
+                    if st.button("✖️ Close", key="close_view_version"):
+                        st.session_state.view_version = None
+                        st.rerun()
+                try:
+                    st.json(get_version_store().load_version(viewed['file']))
+                except FileNotFoundError:
+                    st.error("Version file not found (it may have been pruned).")
     
     # Tab 3: Auto-Sync
     with tab3:
@@ -0,0 +1,141 @@
+"""
+Approximate Nearest-Neighbour Index for PITUTUR-Wicara
+NumPy IVF (inverted file) index over normalized chunk embeddings
+"""
+
+import os
+import glob
+import hashlib
+import logging
+
+import numpy as np
+
+from file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Below this many chunks exact search is both faster and exact
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", "5000"))
+# Number of clusters (0 = about sqrt(N)); more lists = smaller lists to scan
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+# Clusters scanned per query; higher = better recall, slower queries
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_KMEANS_ITERS = 10
+ANN_TRAIN_POINTS_PER_LIST = 64
+
+# Persisted per KB version next to the knowledge base
+ANN_INDEX_DIR = os.path.join("knowledge_base", "ann_index")
+ANN_KEEP_VERSIONS = 3
+
+def matrix_fingerprint(matrix):
+    """Checksum of an embedding matrix, used to validate a persisted index"""
+    return hashlib.sha1(np.ascontiguousarray(matrix).tobytes()).hexdigest()
+
+class IVFIndex:
+    """Inverted-file index: chunks grouped by nearest k-means centroid"""
+
+    def __init__(self, centroids, order, offsets, fingerprint=""):
+        self.centroids = centroids  # (nlist, dim), normalized
+        self.order = order          # chunk ids sorted by list
+        self.offsets = offsets      # list i = order[offsets[i]:offsets[i+1]]
+        self.fingerprint = fingerprint
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, nlist=None, iters=ANN_KMEANS_ITERS, seed=0):
+        """Train spherical k-means on normalized rows and bucket every chunk"""
+        n = len(matrix)
+        nlist = nlist or ANN_NLIST or int(np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+        rng = np.random.default_rng(seed)
+
+        train_size = min(n, nlist * ANN_TRAIN_POINTS_PER_LIST)
+        train = matrix[rng.choice(n, size=train_size, replace=False)]
+        centroids = train[rng.choice(train_size, size=nlist, replace=False)].copy()
+
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty clusters with random training points
+                sums[empty] = train[rng.choice(train_size, size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        assign = np.argmax(matrix @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist)))).astype(np.int64)
+        return cls(centroids, order, offsets, matrix_fingerprint(matrix))
+
+    def candidates(self, query, nprobe=None):
+        """Chunk ids in the nprobe lists closest to a normalized query"""
+        nprobe = max(1, min(nprobe or ANN_NPROBE, self.nlist))
+        centroid_scores = self.centroids @ query
+        if nprobe < self.nlist:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.nlist)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+    def save(self, path):
+        """Atomically persist the index"""
+        atomic_write(path, lambda f: np.savez(
+            f,
+            centroids=self.centroids,
+            order=self.order,
+            offsets=self.offsets,
+            fingerprint=np.array(self.fingerprint)
+        ))
+
+    @classmethod
+    def load(cls, path):
+        """Load a persisted index"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["centroids"], data["order"], data["offsets"], str(data["fingerprint"]))
+
+def ann_index_path(kb_version, index_dir=ANN_INDEX_DIR):
+    """File holding the ANN index for one KB version"""
+    return os.path.join(index_dir, f"ivf_{kb_version}.npz")
+
+def prune_old_indexes(index_dir=ANN_INDEX_DIR, keep=ANN_KEEP_VERSIONS):
+    """Remove all but the most recent persisted indexes"""
+    files = sorted(glob.glob(os.path.join(index_dir, "ivf_*.npz")), key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def load_or_build_ivf(matrix, kb_version=None, min_chunks=None, index_dir=ANN_INDEX_DIR):
+    """Return an IVF index for large corpora, or None to use exact search"""
+    min_chunks = ANN_MIN_CHUNKS if min_chunks is None else min_chunks
+    if matrix is None or len(matrix) < max(min_chunks, 1):
+        return None
+
+    path = ann_index_path(kb_version, index_dir) if kb_version else None
+    fingerprint = matrix_fingerprint(matrix)
+    if path and os.path.exists(path):
+        try:
+            index = IVFIndex.load(path)
+            if index.fingerprint == fingerprint:
+                logger.info("Loaded ANN index for KB %s (%d lists)", kb_version, index.nlist)
+                return index
+        except Exception as e:
+            logger.warning("Rebuilding unreadable ANN index %s: %s", path, e)
+
+    index = IVFIndex.build(matrix)
+    logger.info("Built ANN index for %d chunks (%d lists)", len(matrix), index.nlist)
+    if path:
+        try:
+            index.save(path)
+            prune_old_indexes(index_dir)
+        except OSError as e:
+            logger.warning("Could not persist ANN index: %s", e)
+    return index
@@ -0,0 +1,207 @@
+"""
+Semantic Answer Cache for PITUTUR-Wicara
+Reuses answers for similar questions against the same KB version
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from file_utils import atomic_write, write_json_atomic
+from text_utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_FILE = os.path.join("knowledge_base", "answer_cache", "answers.npz")
+PRECOMPUTED_ANSWERS_FILE = os.path.join("knowledge_base", "answer_cache", "precomputed.json")
+# Cosine similarity needed to reuse an answer for a differently-worded question
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+
+class SemanticAnswerCache:
+    """LRU/TTL answer cache matched by query embedding similarity"""
+
+    def __init__(self, path=ANSWER_CACHE_FILE, threshold=ANSWER_CACHE_THRESHOLD,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # (kb_version, normalized query) -> entry
+        self.hits = 0
+        self.misses = 0
+        self._matrices = {}           # kb_version -> (keys, normalized matrix)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Load persisted entries (missing or corrupt file = empty cache)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                embeddings = data["embeddings"]
+            for item in meta:
+                index = item.pop("embedding_row")
+                item["embedding"] = embeddings[index] if index >= 0 else None
+                self.entries[(item["kb_version"], item["key"])] = item
+            self._expire(time.time())
+        except Exception as e:
+            logger.warning("Ignoring unreadable answer cache %s: %s", self.path, e)
+            self.entries.clear()
+
+    def save(self):
+        """Atomically persist all entries"""
+        with self._lock:
+            meta, vectors = [], []
+            for entry in self.entries.values():
+                item = {k: v for k, v in entry.items() if k != "embedding"}
+                if entry["embedding"] is not None:
+                    item["embedding_row"] = len(vectors)
+                    vectors.append(entry["embedding"])
+                else:
+                    item["embedding_row"] = -1
+                meta.append(item)
+            dim = len(vectors[0]) if vectors else 0
+            embeddings = np.stack(vectors).astype(np.float32) if vectors else np.zeros((0, dim), dtype=np.float32)
+
+        atomic_write(self.path, lambda f: np.savez(
+            f, embeddings=embeddings, meta=np.array(json.dumps(meta, ensure_ascii=False))
+        ))
+
+    def _expire(self, now):
+        """Drop entries older than the TTL"""
+        expired = [key for key, entry in self.entries.items() if now - entry["created_at"] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self._matrices.clear()
+
+    def _version_matrix(self, kb_version):
+        """Stacked, normalized query embeddings of one KB version's entries"""
+        if kb_version not in self._matrices:
+            keys = [key for key, entry in self.entries.items()
+                    if key[0] == kb_version and entry["embedding"] is not None]
+            if keys:
+                matrix = np.stack([self.entries[key]["embedding"] for key in keys]).astype(np.float32)
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            else:
+                matrix = None
+            self._matrices[kb_version] = (keys, matrix)
+        return self._matrices[kb_version]
+
+    def lookup(self, query, query_embedding, kb_version):
+        """Return the cached entry for a similar question, or None"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            key = (kb_version, normalize_query(query))
+            entry = self.entries.get(key)
+
+            if entry is None and query_embedding is not None:
+                keys, matrix = self._version_matrix(kb_version)
+                if matrix is not None:
+                    query_vec = np.asarray(query_embedding, dtype=np.float32)
+                    query_vec = query_vec / max(float(np.linalg.norm(query_vec)), 1e-12)
+                    similarities = matrix @ query_vec
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        key = keys[best]
+                        entry = self.entries[key]
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry["hits"] += 1
+            entry["last_used"] = now
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, query, query_embedding, answer, kb_version):
+        """Store an answer for a question under a KB version"""
+        now = time.time()
+        with self._lock:
+            # Entries for older KB versions can never match again
+            for key in [key for key in self.entries if key[0] != kb_version]:
+                del self.entries[key]
+            key = (kb_version, normalize_query(query))
+            self.entries[key] = {
+                "key": key[1],
+                "query": query,
+                "answer": answer,
+                "kb_version": kb_version,
+                "embedding": None if query_embedding is None else np.asarray(query_embedding, dtype=np.float32),
+                "created_at": now,
+                "last_used": now,
+                "hits": 0,
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._matrices.clear()
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning("Could not persist answer cache: %s", e)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.entries),
+        }
+
+def load_precomputed_answers(path=PRECOMPUTED_ANSWERS_FILE):
+    """Load answers precomputed for the canonical questions"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable precomputed answers %s: %s", path, e)
+    return {"kb_version": None, "answers": {}}
+
+class PrecomputedAnswers:
+    """Precomputed answer store, re-read only when the file's mtime/size change"""
+
+    def __init__(self, path=PRECOMPUTED_ANSWERS_FILE):
+        self.path = path
+        self._store = {"kb_version": None, "answers": {}}
+        self._stat_key = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Latest store; costs one os.stat() unless the file was rewritten"""
+        try:
+            stat = os.stat(self.path)
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stat_key = None
+        with self._lock:
+            if stat_key != self._stat_key:
+                self._store = load_precomputed_answers(self.path)
+                self._stat_key = stat_key
+            return self._store
+
+def save_precomputed_answers(store, path=PRECOMPUTED_ANSWERS_FILE):
+    """Atomically write the precomputed answer store"""
+    write_json_atomic(path, store)
+
+def get_precomputed_answer(store, query, kb_version):
+    """Precomputed answer for a question, or None if missing or stale"""
+    if not store or store.get("kb_version") != kb_version:
+        return None
+    entry = store.get("answers", {}).get(normalize_query(query))
+    return entry["answer"] if entry else None
@@ -1,20 +1,53 @@
+import time
+_import_start = time.perf_counter()
+
 import streamlit as st
-import json
 import os
-import re
+import logging
 from datetime import datetime
 
-# Force reload: 2025-12-04 15:50
-from PyPDF2 import PdfReader
-import requests
-import numpy as np
-from sentence_transformers import SentenceTransformer
+# Heavy modules (sentence_transformers / torch) are imported lazily by
+# model_loader in a background thread so the UI paints immediately
+from retrieval import KBIndex
+from embeddings import EmbeddingCache
+from embedding_backends import embedding_cache_name
+from kb_pipeline import (
+    get_kb_version, text_to_sections,
+    build_documents, encode_query, build_prompt, load_canonical_questions
+)
+from context_compressor import COMPRESSION_ENABLED, compress_docs
+from model_router import get_router
+from model_loader import get_model_loader
+from kb_watcher import get_kb_watcher
+from answer_cache import SemanticAnswerCache, PrecomputedAnswers, get_precomputed_answer
+
+# Log ingest/startup metrics (encode throughput etc.) to the server console
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="[%(asctime)s] %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+logger.info("App modules imported in %.2fs", time.perf_counter() - _import_start)
+
+# Load embedding model (background thread, shared by all sessions)
+def load_embedding_model():
+    """Sentence transformer for semantic search, or None while it is still loading"""
+    loader = get_model_loader()
+    if loader.error is not None:
+        raise loader.error
+    return loader.model
 
-# Load embedding model (cached)
 @st.cache_resource
-def load_embedding_model():
-    """Load sentence transformer model for semantic search"""
-    return SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+def load_answer_cache():
+    """Process-wide semantic answer cache persisted on disk"""
+    return SemanticAnswerCache()
+
+@st.cache_resource
+def load_precomputed():
+    """Answers precomputed for the example questions (reloaded when the file changes)"""
+    return PrecomputedAnswers()
+
+@st.cache_resource
+def load_embedding_cache(cache_name):
+    """Process-wide chunk embedding cache persisted on disk (one per backend)"""
+    return EmbeddingCache(cache_name)
 
 # Page config
 st.set_page_config(
@@ -108,38 +141,27 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Load Knowledge Base from JSON if available
-@st.cache_data(ttl=5)  # Cache for 5 seconds for instant updates
 def load_knowledge_from_json():
-    """Load knowledge base from JSON file if exists"""
-    kb_file = "knowledge_base/current_knowledge.json"
-    if os.path.exists(kb_file):
-        try:
-            with open(kb_file, 'r', encoding='utf-8') as f:
-                kb_data = json.load(f)
-            
-            # Convert JSON to text format
-            text_content = "INFORMASI BANK INDONESIA KANTOR PERWAKILAN PURWOKERTO\n\n"
-            for section in kb_data.get("sections", []):
-                text_content += "=" * 47 + "\n"
-                text_content += section.get("title", "").upper() + "\n"
-                text_content += "=" * 47 + "\n\n"
-                text_content += section.get("content", "") + "\n\n"
-            
-            return text_content
-        except Exception as e:
-            st.warning(f"⚠️ Error loading knowledge base from JSON: {e}")
-            return None
-    return None
+    """Current KB snapshot from the file watcher (no file I/O between changes)"""
+    watcher = get_kb_watcher()
+    if watcher.error is not None:
+        st.warning(f"⚠️ Error loading knowledge base from JSON: {watcher.error}")
+    return watcher.current()
 
 # Built-in Knowledge Base - Bank Indonesia Perwakilan Purwokerto
-# Load dynamically (will refresh every 5 minutes or when cache expires)
+# Published by the KB watcher as soon as current_knowledge.json changes
 def get_builtin_knowledge():
-    """Get built-in knowledge, try JSON first, fallback to hardcoded"""
-    _kb_from_json = load_knowledge_from_json()
-    if _kb_from_json:
-        return _kb_from_json
+    """Get built-in knowledge sections and their version, try JSON first, fallback to hardcoded"""
+    snapshot = load_knowledge_from_json()
+    if snapshot and snapshot.text:
+        # The watcher parsed and hashed the KB once when it was published
+        return snapshot.sections, snapshot.version
     
-    # Fallback hardcoded knowledge
+    knowledge_text = get_fallback_knowledge()
+    return text_to_sections(knowledge_text), get_kb_version(knowledge_text)
+
+def get_fallback_knowledge():
+    """Hardcoded knowledge used when no JSON knowledge base is available"""
     return """
 INFORMASI BANK INDONESIA KANTOR PERWAKILAN PURWOKERTO
 
@@ -351,227 +373,128 @@ PROGRAM UNGGULAN:
 # Initialize session state
 if 'messages' not in st.session_state:
     st.session_state.messages = []
-if 'documents' not in st.session_state:
-    st.session_state.documents = []
+if 'kb_index' not in st.session_state:
+    st.session_state.kb_index = None
+if 'kb_version' not in st.session_state:
+    st.session_state.kb_version = None
+if 'kb_semantic' not in st.session_state:
+    st.session_state.kb_semantic = False
 if 'api_key' not in st.session_state:
     # Load API key from Streamlit secrets or environment variable
     try:
         st.session_state.api_key = st.secrets.get("GEMINI_API_KEY", "")
     except:
         st.session_state.api_key = os.getenv("GEMINI_API_KEY", "")
-if 'builtin_loaded' not in st.session_state:
-    st.session_state.builtin_loaded = False
 if 'sidebar_open' not in st.session_state:
     st.session_state.sidebar_open = False
 
 # Functions
-def load_builtin_knowledge(model=None):
+def load_builtin_knowledge(model=None, sections=None):
     """Load built-in knowledge base about BI Purwokerto"""
-    knowledge_text = get_builtin_knowledge()  # Get fresh knowledge (cache 5 min)
-    chunks = chunk_text(knowledge_text)
-    docs = []
-    for i, chunk in enumerate(chunks):
-        docs.append({
-            'id': f"builtin_purwokerto_{i}",
-            'filename': "📘 Pengetahuan BI Purwokerto (Built-in)",
-            'chunk': chunk,
-            'features': create_embedding_features(chunk, model),
-            'index': i,
-            'total_chunks': len(chunks)
-        })
-    return docs
-
-def chunk_text(text, chunk_size=2000, overlap=400):
-    """Split text into overlapping chunks"""
-    chunks = []
-    start = 0
-    text_len = len(text)
-    
-    while start < text_len:
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start = end - overlap
-    
-    return chunks
-
-def create_embedding_features(text, model=None):
-    """Create embedding vector for semantic search"""
-    words = text.lower().split()
-    features = {
-        'text': text,
-        'words': set(words),
-        'length': len(text),
-        'keywords': [w for w in words if len(w) > 4][:30]
-    }
-    
-    # Add semantic embedding if model is provided
-    if model is not None:
-        try:
-            features['embedding'] = model.encode(text, convert_to_numpy=True)
-        except:
-            features['embedding'] = None
-    
-    return features
-
-def cosine_similarity(vec1, vec2):
-    """Calculate cosine similarity between two vectors"""
-    if vec1 is None or vec2 is None:
-        return 0.0
-    dot_product = np.dot(vec1, vec2)
-    norm1 = np.linalg.norm(vec1)
-    norm2 = np.linalg.norm(vec2)
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    return dot_product / (norm1 * norm2)
-
-def find_relevant_chunks(query, documents, model=None, top_k=5):
-    """Find most relevant document chunks using semantic search"""
-    if not documents:
+    if sections is None:
+        sections, _ = get_builtin_knowledge()  # Current version from the KB watcher
+    cache = load_embedding_cache(embedding_cache_name(model)) if model is not None else None
+    return build_documents(sections, model, cache=cache)
+
+@st.cache_resource(max_entries=2)
+def get_shared_kb_index(kb_version, semantic, _sections, _model=None):
+    """Build the process-wide KB index once per KB version (shared by all sessions)"""
+    docs = load_builtin_knowledge(_model, _sections)
+    return KBIndex(docs, version=kb_version)
+
+def find_relevant_chunks(query, kb_index, model=None, top_k=5, query_embedding=None):
+    """Find most relevant document chunks using vectorized hybrid search"""
+    if kb_index is None or kb_index.size == 0:
         return []
     
-    query_lower = query.lower()
-    
     # Generate query embedding for semantic search
-    query_embedding = None
-    if model is not None:
-        try:
-            query_embedding = model.encode(query, convert_to_numpy=True)
-        except:
-            pass
-    
-    scored_docs = []
-    for doc in documents:
-        score = 0.0
-        
-        # SEMANTIC SIMILARITY (Primary scoring method)
-        if query_embedding is not None and doc['features'].get('embedding') is not None:
-            semantic_score = cosine_similarity(query_embedding, doc['features']['embedding'])
-            score += semantic_score * 100  # Scale to 0-100
-        
-        # KEYWORD MATCHING (Fallback/boost)
-        doc_text = doc['chunk'].lower()
-        query_words = set(query_lower.split())
-        doc_words = doc['features']['words']
-        
-        # Word overlap
-        overlap = query_words.intersection(doc_words)
-        score += len(overlap) * 2
-        
-        # Exact phrase match
-        if len(query) > 3 and query_lower in doc_text:
-            score += 10
-        
-        if score > 0:
-            scored_docs.append({
-                'doc': doc,
-                'score': score
-            })
+    if query_embedding is None:
+        query_embedding = encode_query(query, model)
     
-    scored_docs.sort(key=lambda x: x['score'], reverse=True)
-    return [item['doc'] for item in scored_docs[:top_k]]
+    return kb_index.search(query, query_embedding, top_k=top_k)
 
-def chat_with_ai(user_message, relevant_docs, api_key):
-    """Send message to Gemini AI using REST API"""
+def get_config(name, default=None):
+    """Read a setting from Streamlit secrets, falling back to environment"""
     try:
-        # Build context from relevant documents
-        context = ""
-        if relevant_docs:
-            context = "Informasi dari dokumen Bank Indonesia:\n\n"
-            for i, doc in enumerate(relevant_docs):
-                context += f"[Dokumen {i+1}: {doc['filename']}, Bagian {doc['index']+1}/{doc['total_chunks']}]\n"
-                context += f"{doc['chunk']}\n\n"
-        
-        # Build prompt
-        if context:
-            prompt = f"""Kamu adalah asisten chatbot Bank Indonesia Perwakilan Purwokerto yang membantu menjawab pertanyaan.
-
-INFORMASI DARI DOKUMEN:
-{context}
-
-PERTANYAAN: {user_message}
-
-INSTRUKSI PENTING:
-- WAJIB gunakan HANYA informasi dari dokumen di atas untuk menjawab
-- Jika informasi ada di dokumen, jawab dengan detail dan lengkap dari dokumen tersebut
-- JANGAN katakan "informasi tidak tersedia" jika sudah ada di dokumen
-- Jawab dengan struktur yang jelas menggunakan bullet points dan numbering
-- Berikan informasi praktis yang bisa langsung digunakan
-- Sertakan nomor kontak, alamat, atau link yang relevan dari dokumen
-- Jawab dalam Bahasa Indonesia yang ramah dan profesional
-- Jika memang benar-benar tidak ada di dokumen, baru katakan tidak tersedia dan sarankan menghubungi kantor"""
-        else:
-            prompt = f"""Kamu adalah asisten chatbot Bank Indonesia yang membantu menjawab pertanyaan.
+        return st.secrets.get(name, os.getenv(name, default))
+    except Exception:
+        return os.getenv(name, default)
 
-Pertanyaan: {user_message}
+# Stream answers token-by-token (set GEMINI_STREAMING=false to disable)
+STREAMING_ENABLED = str(get_config("GEMINI_STREAMING", "true")).lower() not in ("0", "false", "no")
 
-Instruksi:
-- Jawab berdasarkan pengetahuan umum tentang Bank Indonesia
-- Berikan informasi yang akurat dan bermanfaat
-- Sertakan link ke website resmi bi.go.id untuk informasi lebih lanjut
-- Jawab dalam Bahasa Indonesia dengan ramah dan profesional"""
-        
-        # Call Gemini API using REST
-        models_to_try = [
-            "gemini-2.5-flash",
-            "gemini-2.0-flash",
-            "gemini-2.5-flash-lite",
-            "gemini-2.0-flash-lite",
-        ]
-        
-        last_error = None
-        
-        for model_name in models_to_try:
-            try:
-                url = f"https://generativelanguage.googleapis.com/v1/models/{model_name}:generateContent?key={api_key}"
-                
-                headers = {
-                    'Content-Type': 'application/json'
-                }
-                
-                data = {
-                    "contents": [{
-                        "parts": [{
-                            "text": prompt
-                        }]
-                    }]
-                }
-                
-                response = requests.post(url, headers=headers, json=data, timeout=30)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'candidates' in result and len(result['candidates']) > 0:
-                        text = result['candidates'][0]['content']['parts'][0]['text']
-                        return text, relevant_docs
-                else:
-                    last_error = response.json() if response.content else "Unknown error"
-                    continue
-            except Exception as e:
-                last_error = str(e)
-                continue
+def chat_with_ai(user_message, relevant_docs, api_key):
+    """Send message to Gemini AI using REST API"""
+    try:
+        prompt = build_prompt(user_message, relevant_docs)
         
-        return f"❌ Tidak ada model yang berhasil. Last error: {last_error}", None
+        try:
+            text = get_router().generate(prompt, api_key)
+            return text, relevant_docs
+        except Exception as e:
+            return f"❌ Tidak ada model yang berhasil. Last error: {e}", None
     
     except Exception as e:
         return f"❌ Error: {str(e)}", None
 
+def stream_chat_with_ai(user_message, relevant_docs, api_key):
+    """Stream the Gemini answer via SSE, yielding text pieces as they arrive"""
+    try:
+        prompt = build_prompt(user_message, relevant_docs)
+    except Exception as e:
+        yield f"❌ Error: {str(e)}"
+        return
+    
+    # The router tries healthy models in order (skipping open circuits)
+    received = False
+    try:
+        for text in get_router().stream(prompt, api_key):
+            received = True
+            yield text
+    except Exception as e:
+        if received:
+            # Part of the answer is already on screen; don't restart on another model
+            yield f"\n\n❌ Error: {str(e)}"
+        else:
+            yield f"❌ Tidak ada model yang berhasil. Last error: {e}"
+
+def render_chat_message(role, content, target=None):
+    """Render one chat bubble (into a placeholder when streaming)"""
+    target = target or st
+    if role == 'user':
+        target.markdown(f"""
+                <div class="chat-message user-message">
+                    <strong>👤 Anda:</strong><br/>
+                    {content}
+                </div>
+                """, unsafe_allow_html=True)
+    else:
+        target.markdown(f"""
+                <div class="chat-message assistant-message">
+                    <strong>🤖 Asisten BI:</strong><br/>
+                    {content}
+                </div>
+                """, unsafe_allow_html=True)
+
 # Main App
 def main():
-    # Load embedding model
+    # Load embedding model; keyword-only search is used until it is ready
     try:
         embedding_model = load_embedding_model()
-        model_loaded = True
     except Exception as e:
         st.warning(f"⚠️ Semantic search tidak tersedia: {str(e)}")
         embedding_model = None
-        model_loaded = False
+    semantic_ready = embedding_model is not None
     
-    # Auto-load built-in knowledge base (only once)
-    if not st.session_state.builtin_loaded:
-        builtin_docs = load_builtin_knowledge(embedding_model)
-        st.session_state.documents.extend(builtin_docs)
-        st.session_state.builtin_loaded = True
+    # Auto-load built-in knowledge base and hot-swap it when the KB changes
+    # (or when the embedding model becomes ready). Sessions only hold a
+    # reference to the shared index plus its version; rebuilding re-embeds
+    # only chunks whose content hash is not cached yet.
+    kb_sections, kb_version = get_builtin_knowledge()
+    if st.session_state.kb_version != kb_version or st.session_state.kb_semantic != semantic_ready:
+        st.session_state.kb_index = get_shared_kb_index(kb_version, semantic_ready, kb_sections, embedding_model)
+        st.session_state.kb_version = kb_version
+        st.session_state.kb_semantic = semantic_ready
     
     # WhatsApp-style Sticky Header
     st.markdown("""
@@ -586,6 +509,9 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    if not semantic_ready and not get_model_loader().finished:
+        st.caption("⏳ Model pencarian semantik sedang dimuat, sementara menggunakan pencarian kata kunci.")
+    
     # Set API key
     api_key = st.session_state.api_key
     
@@ -593,20 +519,7 @@ def main():
     chat_container = st.container()
     with chat_container:
         for message in st.session_state.messages:
-            if message['role'] == 'user':
-                st.markdown(f"""
-                <div class="chat-message user-message">
-                    <strong>👤 Anda:</strong><br/>
-                    {message['content']}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div class="chat-message assistant-message">
-                    <strong>🤖 Asisten BI:</strong><br/>
-                    {message['content']}
-                </div>
-                """, unsafe_allow_html=True)
+            render_chat_message(message['role'], message['content'])
     
     # Chat input
     st.markdown("---")
@@ -620,21 +533,12 @@ def main():
     # Example questions
     st.subheader("💡 Contoh Pertanyaan:")
     col1, col2 = st.columns(2)
+    columns = {1: col1, 2: col2}
     
-    with col1:
-        if st.button("🤖 Apa itu PITUTUR-Wicara?"):
-            st.session_state.example_query = "Apa itu PITUTUR-Wicara dan bagaimana cara menggunakannya?"
-        if st.button("🏛️ Tentang Bank Indonesia"):
-            st.session_state.example_query = "Apa itu Bank Indonesia?"
-        if st.button("📍 Informasi Kantor Perwakilan Bank Indonesia Purwokerto"):
-            st.session_state.example_query = "Informasi Kantor Perwakilan Bank Indonesia Purwokerto"
-        if st.button("💼 Layanan yang tersedia di Bank Indonesia Purwokerto"):
-            st.session_state.example_query = "Layanan apa saja yang tersedia di Bank Indonesia Purwokerto?"
-    with col2:
-        if st.button("🎓 Magang dan PKL"):
-            st.session_state.example_query = "Bagaimana cara mendaftar magang atau PKL di Bank Indonesia Purwokerto?"
-        if st.button("📢 Survei, Pengaduan, dan Informasi Publik"):
-            st.session_state.example_query = "Bagaimana cara menyampaikan pengaduan atau mengakses informasi publik?"
+    for i, question in enumerate(load_canonical_questions()):
+        with columns.get(question.get("column"), col1 if i % 2 == 0 else col2):
+            if st.button(question["label"], key=f"example_{i}"):
+                st.session_state.example_query = question["query"]
     
     # User input
     user_input = st.text_input("Ketik pertanyaan Anda tentang Bank Indonesia...", key="user_input_field", value="")
@@ -655,27 +559,69 @@ def main():
             'content': user_input
         })
         
-        # Find relevant documents with semantic search
-        relevant_docs = find_relevant_chunks(
-            user_input,
-            st.session_state.documents,
-            model=embedding_model,
-            top_k=8
-        )
+        if STREAMING_ENABLED:
+            # Show the question right away, then stream the answer into its bubble
+            with chat_container:
+                render_chat_message('user', user_input)
+                answer_placeholder = st.empty()
+            render_chat_message('assistant', "🤔 Sedang berpikir...", answer_placeholder)
+        
+        # Example questions are answered at KB publish time; otherwise answer
+        # from the semantic cache when a similar question was already
+        # answered against this KB version
+        answer_cache = load_answer_cache()
+        cached = get_precomputed_answer(load_precomputed().current(), user_input, st.session_state.kb_version)
+        query_embedding = None
+        if cached is None:
+            query_embedding = encode_query(user_input, embedding_model)
+            hit = answer_cache.lookup(user_input, query_embedding, st.session_state.kb_version)
+            cached = hit['answer'] if hit else None
         
-        # Get AI response
-        with st.spinner("🤔 Sedang berpikir..."):
-            response, sources = chat_with_ai(
+        if cached is not None:
+            response, sources = cached, None
+            if STREAMING_ENABLED:
+                render_chat_message('assistant', response, answer_placeholder)
+        else:
+            # Find relevant documents with semantic search
+            relevant_docs = find_relevant_chunks(
                 user_input,
-                relevant_docs,
-                st.session_state.api_key
+                st.session_state.kb_index,
+                model=embedding_model,
+                top_k=8,
+                query_embedding=query_embedding
             )
+            if COMPRESSION_ENABLED:
+                relevant_docs = compress_docs(relevant_docs, query_embedding)
+            
+            # Get AI response
+            if STREAMING_ENABLED:
+                response = ""
+                for piece in stream_chat_with_ai(user_input, relevant_docs, st.session_state.api_key):
+                    response += piece
+                    render_chat_message('assistant', response + " ▌", answer_placeholder)
+                render_chat_message('assistant', response, answer_placeholder)
+                sources = None if response.startswith("❌") else relevant_docs
+            else:
+                with st.spinner("🤔 Sedang berpikir..."):
+                    response, sources = chat_with_ai(
+                        user_input,
+                        relevant_docs,
+                        st.session_state.api_key
+                    )
+            
+            # Only cache complete, successful answers
+            if sources is not None and "❌" not in response:
+                answer_cache.put(user_input, query_embedding, response, st.session_state.kb_version)
         
-        # Add assistant message
+        # Add assistant message; sources are kept as plain references, since
+        # retrieved records (and their arrays) would pin the whole KB store
         st.session_state.messages.append({
             'role': 'assistant',
             'content': response,
-            'sources': sources,
+            'sources': [
+                {'filename': doc['filename'], 'section': doc['section'], 'index': doc['index']}
+                for doc in sources
+            ] if sources else None,
             'id': datetime.now().isoformat()
         })
         
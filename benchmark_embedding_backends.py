@@ -0,0 +1,111 @@
+"""
+Benchmark: embedding backends (torch / onnx / quantized)
+Parity against torch, per-query encode latency and process RSS; each
+backend runs in its own subprocess so RSS numbers do not mix
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import numpy as np
+
+QUERIES = [
+    "Apa itu PITUTUR-Wicara dan bagaimana cara menggunakannya?",
+    "Apa itu Bank Indonesia?",
+    "Informasi Kantor Perwakilan Bank Indonesia Purwokerto",
+    "Layanan apa saja yang tersedia di Bank Indonesia Purwokerto?",
+    "Bagaimana cara mendaftar magang atau PKL di Bank Indonesia Purwokerto?",
+    "Bagaimana cara menyampaikan pengaduan atau mengakses informasi publik?",
+    "jam buka kantor bi purwokerto",
+    "syarat tukar uang rusak",
+]
+
+def rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_worker(backend, repeats, out_path):
+    """Load one backend, time query encodes and save its embeddings"""
+    from embedding_backends import load_embedding_backend
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    model, _ = load_embedding_backend(backend, parity_check=False)
+    load_seconds = time.perf_counter() - start
+    model.encode(QUERIES[0], convert_to_numpy=True)  # warm-up
+
+    latencies = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            t = time.perf_counter()
+            model.encode(query, convert_to_numpy=True)
+            latencies.append((time.perf_counter() - t) * 1000)
+
+    np.save(out_path, np.asarray(model.encode(QUERIES, convert_to_numpy=True), dtype=np.float32))
+    print(json.dumps({
+        "backend": getattr(model, "backend_name", backend),
+        "load_seconds": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "rss_mb": rss_mb(),
+        "model_rss_mb": rss_mb() - base_rss,
+    }))
+
+def cosine_rows(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", default="torch,onnx,quantized")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repeats, args.out)
+        return 0
+
+    results, vectors = [], {}
+    out_dir = os.path.join("knowledge_base", "embedding_cache")
+    os.makedirs(out_dir, exist_ok=True)
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        out_path = os.path.join(out_dir, f"benchmark_{backend}.npy")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", backend,
+             "--repeats", str(args.repeats), "--out", out_path],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"{backend}: failed\n{proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else ''}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["requested"] = backend
+        vectors[backend] = np.load(out_path)
+        os.remove(out_path)
+        results.append(result)
+
+    print(f"{'backend':<12}{'load s':>8}{'p50 ms':>9}{'p90 ms':>9}{'RSS MB':>9}{'model MB':>10}{'min cos':>9}")
+    for result in results:
+        reference = vectors.get("torch")
+        min_cos = cosine_rows(vectors[result["requested"]], reference).min() if reference is not None else float("nan")
+        label = result["requested"] if result["backend"] == result["requested"] else f"{result['requested']}->{result['backend']}"
+        print(f"{label:<12}{result['load_seconds']:>8.2f}{result['p50_ms']:>9.2f}{result['p90_ms']:>9.2f}"
+              f"{result['rss_mb']:>9.0f}{result['model_rss_mb']:>10.0f}{min_cos:>9.4f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark: recall loss of quantized embedding stores
+Compares int8 (with and without float32 re-score) against exact float32 search
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from retrieval import normalize_rows, top_k_indices
+
+def load_matrix(args):
+    """Embeddings from the embedding cache if present, else synthetic clusters"""
+    if args.cache:
+        if args.cache.endswith(".npz"):  # legacy EmbeddingCache layout
+            with np.load(args.cache, allow_pickle=False) as data:
+                return normalize_rows(data["vectors"])
+        return normalize_rows(np.load(args.cache, allow_pickle=False)["vector"])
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(max(1, args.chunks // 50), args.dim))
+    matrix = centers[rng.integers(len(centers), size=args.chunks)] + 0.6 * rng.normal(size=(args.chunks, args.dim))
+    return normalize_rows(matrix)
+
+def recall_at_k(store, matrix, queries, k, rescore):
+    """Average overlap of the store's top-k with exact float32 top-k"""
+    hits, elapsed = 0, 0.0
+    for query in queries:
+        exact = set(top_k_indices(matrix @ query, k).tolist())
+        start = time.perf_counter()
+        scores = store.scores(query)
+        if rescore:
+            ids = top_k_indices(scores, max(k, store.rescore_candidates))
+            scores = np.full(len(scores), -np.inf, dtype=np.float32)
+            scores[ids] = store.exact_scores(query, ids)
+        found = top_k_indices(scores, k)
+        elapsed += time.perf_counter() - start
+        hits += len(exact & set(found.tolist()))
+    return hits / (k * len(queries)), elapsed / len(queries) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--rescore", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", help="embedding cache .npy to use instead of synthetic data")
+    args = parser.parse_args()
+
+    matrix = load_matrix(args)
+    rng = np.random.default_rng(args.seed + 1)
+    rows = rng.integers(len(matrix), size=args.queries)
+    queries = normalize_rows(matrix[rows] + 0.5 * rng.normal(size=(args.queries, matrix.shape[1])) / np.sqrt(matrix.shape[1]) * 4)
+
+    print(f"{len(matrix)} chunks x {matrix.shape[1]} dims, {args.queries} queries, top-{args.top_k}")
+    print(f"{'precision':<22}{'memory':>10}{'recall':>9}{'ms/query':>10}")
+    rescore_file = os.path.join(tempfile.mkdtemp(), "float32_benchmark.npy")  # re-score reads from disk
+    for precision in ("float32", "int8"):
+        for rescore in (0, args.rescore):
+            if rescore and precision == "float32":
+                continue
+            store = EmbeddingStore(matrix, precision, rescore_candidates=rescore, rescore_file=rescore_file)
+            recall, ms = recall_at_k(store, matrix, queries, args.top_k, rescore > 0)
+            label = precision + (f" + rescore {rescore}" if rescore else "")
+            print(f"{label:<22}{store.nbytes / 1e6:>8.1f}MB{recall:>9.4f}{ms:>10.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
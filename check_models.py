@@ -4,33 +4,51 @@ import os
 # Load API key from environment variable
 API_KEY = os.getenv("GEMINI_API_KEY", "your-api-key-here")
 
-# Cek model yang tersedia
-url = f"https://generativelanguage.googleapis.com/v1/models?key={API_KEY}"
-
-response = requests.get(url)
-
-if response.status_code == 200:
-    data = response.json()
-    print("=" * 60)
-    print("MODEL YANG TERSEDIA UNTUK API KEY ANDA:")
-    print("=" * 60)
-    
-    if 'models' in data:
-        for model in data['models']:
-            name = model.get('name', 'Unknown')
-            display_name = model.get('displayName', 'Unknown')
-            supported_methods = model.get('supportedGenerationMethods', [])
-            
-            # Cek apakah support generateContent
-            if 'generateContent' in supported_methods:
-                print(f"\n✅ {name}")
-                print(f"   Display Name: {display_name}")
-                print(f"   Methods: {', '.join(supported_methods)}")
+MODELS_URL = "https://generativelanguage.googleapis.com/v1/models"
+
+def fetch_models(api_key=API_KEY, timeout=10, session=None):
+    """Cek model yang tersedia; returns (status_code, response json)"""
+    response = (session or requests).get(MODELS_URL, params={"key": api_key}, timeout=timeout)
+    return response.status_code, response.json()
+
+def list_generate_models(api_key=API_KEY, timeout=10, session=None):
+    """Names (without 'models/' prefix) of models that support generateContent"""
+    status_code, data = fetch_models(api_key, timeout, session)
+    if status_code != 200:
+        raise RuntimeError(f"Error {status_code}: {data}")
+    return [
+        model.get('name', '').split('/', 1)[-1]
+        for model in data.get('models', [])
+        if 'generateContent' in model.get('supportedGenerationMethods', [])
+    ]
+
+def main():
+    status_code, data = fetch_models()
+
+    if status_code == 200:
+        print("=" * 60)
+        print("MODEL YANG TERSEDIA UNTUK API KEY ANDA:")
+        print("=" * 60)
+
+        if 'models' in data:
+            for model in data['models']:
+                name = model.get('name', 'Unknown')
+                display_name = model.get('displayName', 'Unknown')
+                supported_methods = model.get('supportedGenerationMethods', [])
+
+                # Cek apakah support generateContent
+                if 'generateContent' in supported_methods:
+                    print(f"\n✅ {name}")
+                    print(f"   Display Name: {display_name}")
+                    print(f"   Methods: {', '.join(supported_methods)}")
+        else:
+            print("Tidak ada model ditemukan")
+            print(data)
     else:
-        print("Tidak ada model ditemukan")
+        print(f"Error {status_code}:")
         print(data)
-else:
-    print(f"Error {response.status_code}:")
-    print(response.json())
 
-print("\n" + "=" * 60)
+    print("\n" + "=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Columnar Chunk Store for PITUTUR-Wicara
+All chunks of a KB version held in a few flat arrays instead of per-chunk dicts
+"""
+
+import re
+import sys
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    """Lowercase word tokens used by the keyword and phrase indexes"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def _intern_ids(values, table, index):
+    """Map values to ids in an interning table (None -> -1)"""
+    ids = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            ids[i] = -1
+            continue
+        if value not in index:
+            index[value] = len(table)
+            table.append(sys.intern(value))
+        ids[i] = index[value]
+    return ids
+
+class ChunkRecord:
+    """Lightweight view of one chunk in a ChunkStore.
+
+    Supports read-only mapping access (doc['chunk'], doc.get('section'),
+    dict(doc)) so prompt building works on records and plain dicts alike.
+    """
+
+    __slots__ = ("store", "position")
+
+    FIELDS = ("id", "filename", "chunk", "section", "heading", "index", "total_chunks")
+
+    def __init__(self, store, position):
+        self.store = store
+        self.position = position
+
+    @property
+    def id(self):
+        return f"{self.store.id_prefix}_{self.store.ids[self.position]}"
+
+    @property
+    def filename(self):
+        return self.store.filenames[self.store.file_ids[self.position]]
+
+    @property
+    def chunk(self):
+        return self.store.text_of(self.position)
+
+    @property
+    def section(self):
+        section_id = self.store.section_ids[self.position]
+        return self.store.sections[section_id] if section_id >= 0 else None
+
+    @property
+    def heading(self):
+        heading_id = self.store.heading_ids[self.position]
+        return self.store.headings[heading_id] if heading_id >= 0 else None
+
+    @property
+    def index(self):
+        return int(self.store.ids[self.position])
+
+    @property
+    def total_chunks(self):
+        return len(self.store)
+
+    @property
+    def sentences(self):
+        return self.store.sentences_of(self.position)
+
+    @property
+    def sentence_embeddings(self):
+        return self.store.sentence_embeddings_of(self.position)
+
+    def keys(self):
+        return self.FIELDS
+
+    def __getitem__(self, key):
+        if key in self.FIELDS or key in ("sentences", "sentence_embeddings"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __repr__(self):
+        return f"ChunkRecord({self.id!r}, section={self.section!r})"
+
+class ChunkStore:
+    """Immutable column arrays for the chunks of one KB version"""
+
+    def __init__(self, chunks, embeddings=None, filename="", id_prefix="chunk"):
+        n = len(chunks)
+        texts = [chunk["text"] for chunk in chunks]
+        self.id_prefix = id_prefix
+        self.filenames = [filename]
+        self.file_ids = np.zeros(n, dtype=np.int16)
+        self.ids = np.arange(n, dtype=np.int32)
+
+        # Text: one UTF-8 buffer plus byte offsets (a str holding a single
+        # emoji would use 4 bytes per character for the whole corpus)
+        encoded = [t.encode("utf-8") for t in texts]
+        self.text = b"".join(encoded)
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([len(t) for t in encoded])
+
+        self.sections, self.headings = [], []
+        self.section_ids = _intern_ids([c.get("section_title") for c in chunks], self.sections, {})
+        self.heading_ids = _intern_ids([c.get("heading") for c in chunks], self.headings, {})
+
+        # Interned token ids (flat, chunk i = token_ids[token_offsets[i]:token_offsets[i + 1]])
+        self.vocab = []
+        vocab_index = {}
+        tokens = [tokenize(t) for t in texts]
+        self.token_offsets = np.zeros(n + 1, dtype=np.int64)
+        self.token_offsets[1:] = np.cumsum([len(t) for t in tokens])
+        self.token_ids = _intern_ids([tok for doc in tokens for tok in doc], self.vocab, vocab_index)
+
+        # Single embedding matrix; rows of chunks that failed to embed stay zero
+        self.embeddings = None
+        if embeddings is not None:
+            dim = next((len(v) for v in embeddings if v is not None), 0)
+            if dim:
+                self.embeddings = np.zeros((n, dim), dtype=np.float32)
+                for i, vector in enumerate(embeddings):
+                    if vector is not None:
+                        self.embeddings[i] = vector
+
+        # Sentence units for context compression (see attach_sentences)
+        self.unit_offsets = None
+        self.unit_spans = None
+        self.unit_lines = None
+        self.unit_keep = None
+        self.sentence_embeddings = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        position = int(position)
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return ChunkRecord(self, position)
+
+    def __iter__(self):
+        return (ChunkRecord(self, i) for i in range(len(self)))
+
+    def text_of(self, position):
+        return self.text[self.offsets[position]:self.offsets[position + 1]].decode("utf-8")
+
+    def tokens_of(self, position):
+        return self.token_ids[self.token_offsets[position]:self.token_offsets[position + 1]]
+
+    def attach_sentences(self, units_per_chunk, embeddings):
+        """Store (line_no, text, always_keep) units and one embedding per unit"""
+        spans, lines, keep, counts = [], [], [], []
+        for position, units in enumerate(units_per_chunk):
+            chunk, cursor = self.text_of(position), 0
+            for line_no, text, always in units:
+                start = chunk.find(text, cursor)
+                if start < 0:
+                    start = cursor
+                spans.append((start, start + len(text)))
+                cursor = start + len(text)
+                lines.append(line_no)
+                keep.append(always)
+            counts.append(len(units))
+        self.unit_offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        self.unit_offsets[1:] = np.cumsum(counts)
+        self.unit_spans = np.array(spans, dtype=np.int32).reshape(-1, 2)
+        self.unit_lines = np.array(lines, dtype=np.int32)
+        self.unit_keep = np.array(keep, dtype=bool)
+        self.sentence_embeddings = embeddings
+
+    def sentences_of(self, position):
+        """(line_no, text, always_keep) units of a chunk, or None"""
+        if self.unit_offsets is None:
+            return None
+        chunk = self.text_of(position)
+        start, end = self.unit_offsets[position], self.unit_offsets[position + 1]
+        return [
+            (int(line_no), chunk[a:b], bool(keep))
+            for (a, b), line_no, keep in zip(self.unit_spans[start:end], self.unit_lines[start:end], self.unit_keep[start:end])
+        ]
+
+    def sentence_embeddings_of(self, position):
+        if self.unit_offsets is None or self.sentence_embeddings is None:
+            return None
+        return self.sentence_embeddings[self.unit_offsets[position]:self.unit_offsets[position + 1]]
+
+    def release_embeddings(self):
+        """Drop the float32 chunk matrix once an index holds its own copy"""
+        self.embeddings = None
+
+    def freeze(self):
+        """Mark all arrays read-only (the store is shared by all sessions)"""
+        for array in (self.file_ids, self.ids, self.offsets, self.section_ids, self.heading_ids,
+                      self.token_offsets, self.token_ids, self.embeddings, self.unit_offsets,
+                      self.unit_spans, self.unit_lines, self.unit_keep, self.sentence_embeddings):
+            if array is not None:
+                array.flags.writeable = False
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the store"""
+        arrays = (self.file_ids, self.ids, self.offsets, self.section_ids, self.heading_ids,
+                  self.token_offsets, self.token_ids, self.embeddings, self.unit_offsets,
+                  self.unit_spans, self.unit_lines, self.unit_keep, self.sentence_embeddings)
+        total = sum(a.nbytes for a in arrays if a is not None)
+        total += sys.getsizeof(self.text)
+        total += sum(sys.getsizeof(s) for s in self.vocab + self.sections + self.headings)
+        return total
@@ -0,0 +1,144 @@
+"""
+Structure-Aware Chunker for PITUTUR-Wicara
+Splits KB sections at headings, paragraphs and list items under a token budget
+"""
+
+import os
+import re
+
+# Target size of one chunk (estimated tokens, including the title prefix)
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "200"))
+
+# Rough chars-per-token ratio for Indonesian text with the Gemini tokenizer
+CHARS_PER_TOKEN = 4
+
+NUMBERED_HEADING = re.compile(r"^\d+(\.\d+)+\.?\s+\S")        # "3.1.1 SYARAT ..."
+LIST_ITEM = re.compile(r"^\s*([-*•]|\d+[.)]|[a-zA-Z][.)])\s+")  # "- x", "1. x", "a. x"
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text):
+    """Cheap token estimate used for chunk and prompt budgets"""
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN) if text else 0
+
+def is_heading(line):
+    """Numbered sub-headings ("2.3 JAM PELAYANAN") and all-caps title lines"""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 100 or line[:1].isspace():
+        return False
+    if NUMBERED_HEADING.match(stripped):
+        return True
+    if LIST_ITEM.match(stripped):
+        return False
+    letters = [c for c in stripped if c.isalpha()]
+    return len(letters) >= 4 and all(c.isupper() for c in letters)
+
+def split_units(content):
+    """Group section content into (heading, [units]) blocks.
+
+    A unit is a paragraph or a list item together with its indented
+    sub-items; units are never split unless one alone exceeds the budget.
+    """
+    blocks = [[None, []]]
+    current = None  # (kind, lines)
+
+    def flush():
+        nonlocal current
+        if current and any(l.strip() for l in current[1]):
+            blocks[-1][1].append("\n".join(l.rstrip() for l in current[1]).strip("\n"))
+        current = None
+
+    for line in content.splitlines():
+        if not line.strip():
+            flush()
+        elif is_heading(line):
+            flush()
+            blocks.append([line.strip(), []])
+        elif LIST_ITEM.match(line):
+            if current and current[0] == "list" and line[:1].isspace():
+                current[1].append(line)  # nested item stays with its parent
+            else:
+                flush()
+                current = ("list", [line])
+        elif current and (current[0] == "para" or line[:1].isspace()):
+            current[1].append(line)
+        else:
+            flush()
+            current = ("para", [line])
+    flush()
+    return [(heading, units) for heading, units in blocks if heading or units]
+
+def _hard_split(word, budget):
+    """Cut a run without spaces (URL, scraped text) into budget-sized pieces"""
+    width = max(1, budget * CHARS_PER_TOKEN)
+    return [word[i:i + width] for i in range(0, len(word), width)]
+
+def _split_oversized(unit, budget):
+    """Split a unit that alone exceeds the budget at sentences, then words, then characters"""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(unit):
+        words = sentence.split(" ") if estimate_tokens(sentence) > budget else [sentence]
+        words = [piece for word in words for piece in (
+            _hard_split(word, budget) if estimate_tokens(word) > budget else [word]
+        )]
+        for word in words:
+            candidate = f"{current} {word}".strip() if current else word
+            if current and estimate_tokens(candidate) > budget:
+                pieces.append(current)
+                current = word
+            else:
+                current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_section(title, content, budget=None):
+    """Chunk one KB section; every chunk is prefixed with the section title"""
+    budget = budget or CHUNK_TOKEN_BUDGET
+    prefix = title.strip()
+    chunks = []
+    lines = []
+    current_heading = chunk_heading = None
+
+    def body_tokens(extra):
+        return estimate_tokens("\n".join([prefix] + lines + extra))
+
+    def flush():
+        nonlocal lines, chunk_heading
+        if lines:
+            chunks.append({"text": "\n".join([prefix] + lines).strip(), "heading": chunk_heading})
+        lines, chunk_heading = [], None
+
+    for heading, units in split_units(content):
+        block = ([heading] if heading else []) + units
+        # Small sub-sections are packed together; larger ones start a fresh chunk
+        if lines and body_tokens(block) > budget:
+            flush()
+        current_heading = heading or current_heading
+        for i, unit in enumerate(block):
+            parts = [unit]
+            if estimate_tokens(unit) > budget - estimate_tokens(prefix):
+                parts = _split_oversized(unit, max(1, budget - estimate_tokens(prefix) - 1))
+            for part in parts:
+                if lines and body_tokens([part]) > budget:
+                    flush()
+                    # Repeat the sub-heading so continuation chunks keep context
+                    if heading and i > 0:
+                        lines.append(heading)
+                chunk_heading = chunk_heading or current_heading
+                lines.append(part)
+    flush()
+
+    if not chunks and prefix:
+        chunks.append({"text": prefix, "heading": None})
+    return chunks
+
+def chunk_sections(sections, budget=None):
+    """Chunk all KB sections, carrying section metadata on each chunk"""
+    chunks = []
+    for section_index, section in enumerate(sections):
+        title = section.get("title", "")
+        for chunk in chunk_section(title, section.get("content", ""), budget):
+            chunk["section_index"] = section_index
+            chunk["section_title"] = title
+            chunks.append(chunk)
+    return chunks
@@ -0,0 +1,103 @@
+"""
+Context Compressor for PITUTUR-Wicara
+Keeps only the sentences of retrieved chunks that are relevant to the query
+"""
+
+import os
+import re
+import logging
+
+import numpy as np
+
+from chunker import LIST_ITEM, SENTENCE_END, estimate_tokens, is_heading
+
+logger = logging.getLogger(__name__)
+
+# Optional stage between retrieval and prompt building (CONTEXT_COMPRESSION=true)
+COMPRESSION_ENABLED = os.getenv("CONTEXT_COMPRESSION", "false").lower() in ("1", "true", "yes")
+# Cosine similarity a sentence needs against the query to be kept
+SENTENCE_SIMILARITY_THRESHOLD = float(os.getenv("SENTENCE_SIMILARITY_THRESHOLD", "0.3"))
+
+LINK_PATTERN = re.compile(r"https?://|www\.|[\w.+-]+@[\w-]+\.\w+")
+
+def split_sentences(chunk):
+    """Split a chunk into (line_no, text, always_keep) units.
+
+    List items are one unit each, paragraph lines are split into
+    sentences; the title line, headings and links are always kept.
+    """
+    units = []
+    for line_no, line in enumerate(chunk.splitlines()):
+        if not line.strip():
+            continue
+        if line_no == 0 or is_heading(line) or LINK_PATTERN.search(line):
+            units.append((line_no, line, True))
+        elif LIST_ITEM.match(line):
+            units.append((line_no, line, False))
+        else:
+            for sentence in SENTENCE_END.split(line.rstrip()):
+                units.append((line_no, sentence, False))
+    return units
+
+def attach_sentence_embeddings(store, embeddings_for):
+    """Store sentence units and their normalized embeddings on a ChunkStore.
+
+    embeddings_for(texts) returns one vector per text; all units of all
+    chunks are embedded in a single call so the batch/cache path is used.
+    """
+    units_per_chunk = [split_sentences(store.text_of(i)) for i in range(len(store))]
+    texts = [text.strip() for units in units_per_chunk for _, text, _ in units]
+    vectors = embeddings_for(texts) if texts else []
+    matrix = None
+    if texts and all(v is not None for v in vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+    store.attach_sentences(units_per_chunk, matrix)
+    return store
+
+def compress_document(doc, query_vec, threshold):
+    """Copy of doc whose chunk keeps only relevant sentences (None = unchanged)"""
+    units = doc.get('sentences')
+    matrix = doc.get('sentence_embeddings')
+    if not units or matrix is None:
+        return None
+    similarities = matrix @ query_vec
+    keep = np.array([always for _, _, always in units]) | (similarities >= threshold)
+    # Keep at least the best scored sentence so a chunk never loses all content
+    scored = [i for i, (_, _, always) in enumerate(units) if not always]
+    if scored and not keep[scored].any():
+        keep[max(scored, key=lambda i: similarities[i])] = True
+
+    lines = {}
+    for (line_no, text, _), kept in zip(units, keep):
+        if kept:
+            # First kept unit keeps the line's indentation (nested list items)
+            if line_no in lines:
+                lines[line_no].append(text.strip())
+            else:
+                lines[line_no] = [text]
+    compressed = dict(doc)
+    compressed['chunk'] = "\n".join(" ".join(lines[n]) for n in sorted(lines))
+    return compressed
+
+def compress_docs(docs, query_embedding, threshold=None):
+    """Query-focused compression of retrieved chunks (docs unchanged if not possible)"""
+    if query_embedding is None or not docs:
+        return docs
+    threshold = SENTENCE_SIMILARITY_THRESHOLD if threshold is None else threshold
+    query_vec = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query_vec)
+    if norm == 0:
+        return docs
+    query_vec = query_vec / norm
+
+    compressed = []
+    for doc in docs:
+        compressed.append(compress_document(doc, query_vec, threshold) or doc)
+
+    tokens_in = sum(estimate_tokens(doc['chunk']) for doc in docs)
+    tokens_out = sum(estimate_tokens(doc['chunk']) for doc in compressed)
+    logger.info("Context compressed: %d -> %d tokens (%d saved)", tokens_in, tokens_out, tokens_in - tokens_out)
+    return compressed
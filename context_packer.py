@@ -0,0 +1,108 @@
+"""
+Context Packer for PITUTUR-Wicara
+Fits retrieved chunks into a token budget before they go into the prompt
+"""
+
+import os
+
+from chunker import estimate_tokens
+
+# Token budget for the document context of one prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# A chunk whose lines are mostly in the context already is dropped
+REDUNDANCY_THRESHOLD = 0.8
+# Per-document "[Dokumen i: ...]" label added by build_prompt
+LABEL_TOKENS = 15
+
+def _line_key(line):
+    return " ".join(line.lower().split())
+
+def _trim_lines(lines, budget):
+    """Leading lines that fit the budget (at least a cut-down first line)"""
+    kept = []
+    for line in lines:
+        if estimate_tokens("\n".join(kept + [line])) > budget:
+            break
+        kept.append(line)
+    if not kept and lines:
+        kept.append(lines[0][:max(1, budget) * 4])
+    return kept
+
+def pack_context(docs, budget=None):
+    """Merge, deduplicate and budget retrieved chunks (given in score order).
+
+    Chunks adjacent to an already selected chunk of the same section are
+    merged into it, lines repeated across chunks (titles, overlaps) are
+    kept once, mostly-redundant chunks are dropped and chunks are added
+    by score until the token budget is full. Returns (packed docs, stats).
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    blocks = []
+    seen = set()
+    used = 0
+    dropped = 0
+
+    for doc in docs:
+        section_key = _line_key(doc.get('section') or "")
+        lines = [line for line in doc['chunk'].splitlines() if line.strip()]
+        keys = [_line_key(line) for line in lines]
+        content_keys = [k for k in keys if k != section_key] or keys
+        if content_keys and sum(k in seen for k in content_keys) / len(content_keys) >= REDUNDANCY_THRESHOLD:
+            dropped += 1
+            continue
+
+        block = next((
+            b for b in blocks
+            if b['filename'] == doc['filename'] and b['section'] == doc.get('section')
+            and (doc['index'] - 1 in b['parts'] or doc['index'] + 1 in b['parts'])
+        ), None)
+        known = block['keys'] if block else set()
+        new_lines = [line for line, k in zip(lines, keys) if k not in known]
+        cost = estimate_tokens("\n".join(new_lines)) + (0 if block else LABEL_TOKENS)
+
+        if used + cost > budget:
+            if blocks:
+                dropped += 1
+                continue
+            # Always send the best chunk, cut down to the budget if needed
+            new_lines = _trim_lines(new_lines, budget - LABEL_TOKENS)
+            cost = estimate_tokens("\n".join(new_lines)) + LABEL_TOKENS
+
+        if block is None:
+            block = {
+                'filename': doc['filename'],
+                'section': doc.get('section'),
+                'total_chunks': doc.get('total_chunks', 1),
+                'parts': {},
+                'keys': set(),
+            }
+            blocks.append(block)
+        block['parts'][doc['index']] = new_lines
+        block['keys'].update(_line_key(line) for line in new_lines)
+        seen.update(keys)
+        used += cost
+
+    packed = []
+    for block in blocks:
+        indices = sorted(block['parts'])
+        packed.append({
+            'filename': block['filename'],
+            'section': block['section'],
+            'chunk': "\n".join(line for i in indices for line in block['parts'][i]),
+            'index': indices[0],
+            'last_index': indices[-1],
+            'total_chunks': block['total_chunks'],
+        })
+
+    tokens_in = sum(estimate_tokens(doc['chunk']) + LABEL_TOKENS for doc in docs)
+    tokens_out = sum(estimate_tokens(doc['chunk']) + LABEL_TOKENS for doc in packed)
+    stats = {
+        'retrieved': len(docs),
+        'packed': len(packed),
+        'merged': len(docs) - dropped - len(packed),
+        'dropped': dropped,
+        'tokens_in': tokens_in,
+        'tokens_out': tokens_out,
+        'tokens_saved': tokens_in - tokens_out,
+    }
+    return packed, stats
@@ -0,0 +1,111 @@
+"""
+Embedding Model Backends for PITUTUR-Wicara
+torch (default), ONNX Runtime or dynamically-quantized int8 torch on CPU
+"""
+
+import os
+import time
+import logging
+
+import numpy as np
+
+from kb_pipeline import EMBEDDING_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+# torch | onnx | quantized
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# ONNX model file inside the model repo, e.g. onnx/model_qint8_avx2.onnx
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+# Compare a non-torch backend with torch at load time and fall back on mismatch
+EMBEDDING_PARITY_CHECK = os.getenv("EMBEDDING_PARITY_CHECK", "false").lower() in ("1", "true", "yes")
+PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", "0.99"))
+
+BACKENDS = ("torch", "onnx", "quantized")
+
+PARITY_TEXTS = [
+    "Apa itu Bank Indonesia?",
+    "Bagaimana cara mendaftar magang atau PKL di Bank Indonesia Purwokerto?",
+    "Jam pelayanan KPwBI Purwokerto Senin - Jumat, 08:00 - 16:00 WIB",
+    "Syarat penukaran uang rupiah melalui kas keliling",
+    "Bagaimana cara menyampaikan pengaduan perlindungan konsumen?",
+    "QRIS Quick Response Code Indonesian Standard",
+]
+
+def embedding_cache_name(model, model_name=EMBEDDING_MODEL_NAME):
+    """Chunk embedding cache name for the backend that actually loaded.
+
+    Vectors from different backends (or ONNX files) must not mix in one
+    cache; torch keeps the plain model name so existing caches stay valid.
+    """
+    backend = getattr(model, "backend_name", None) or "torch"
+    if backend == "torch":
+        return model_name
+    if backend == "onnx" and EMBEDDING_ONNX_FILE:
+        return f"{model_name}-onnx-{os.path.splitext(os.path.basename(EMBEDDING_ONNX_FILE))[0]}"
+    return f"{model_name}-{backend}"
+
+def load_torch(model_name=EMBEDDING_MODEL_NAME):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu")
+
+def load_onnx(model_name=EMBEDDING_MODEL_NAME):
+    """ONNX Runtime backend (needs sentence-transformers[onnx] >= 3.2)"""
+    from sentence_transformers import SentenceTransformer
+    model_kwargs = {"file_name": EMBEDDING_ONNX_FILE} if EMBEDDING_ONNX_FILE else None
+    return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+def load_quantized(model_name=EMBEDDING_MODEL_NAME):
+    """torch model with Linear layers dynamically quantized to int8"""
+    import torch
+    model = load_torch(model_name)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+LOADERS = {"torch": load_torch, "onnx": load_onnx, "quantized": load_quantized}
+
+def parity(model, reference, texts=PARITY_TEXTS):
+    """Cosine similarity per text between two models' embeddings"""
+    a = np.asarray(model.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    b = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    a /= np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b /= np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+def load_embedding_backend(backend=None, model_name=EMBEDDING_MODEL_NAME, parity_check=None):
+    """Load the configured backend; returns (model, timings).
+
+    Falls back to torch if the backend cannot be loaded or (with the
+    parity check enabled) its embeddings drift from torch's.
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    parity_check = EMBEDDING_PARITY_CHECK if parity_check is None else parity_check
+    if backend not in BACKENDS:
+        logger.warning("Unknown EMBEDDING_BACKEND %r, using torch", backend)
+        backend = "torch"
+
+    start = time.perf_counter()
+    import sentence_transformers  # noqa: F401  (the torch import dominates cold start)
+    imported = time.perf_counter()
+    timings = {"import_seconds": imported - start}
+
+    try:
+        model = LOADERS[backend](model_name)
+    except Exception as e:
+        if backend == "torch":
+            raise
+        logger.warning("Embedding backend %s unavailable (%s), using torch", backend, e)
+        backend, model = "torch", load_torch(model_name)
+    timings["load_seconds"] = time.perf_counter() - imported
+
+    if parity_check and backend != "torch":
+        reference = load_torch(model_name)
+        similarities = parity(model, reference)
+        logger.info("Embedding backend %s parity vs torch: min cosine %.4f", backend, similarities.min())
+        if similarities.min() < PARITY_MIN_COSINE:
+            logger.warning("Embedding backend %s below parity threshold %.3f, using torch", backend, PARITY_MIN_COSINE)
+            backend, model = "torch", reference
+        del reference
+
+    model.backend_name = backend
+    logger.info("Embedding backend: %s", backend)
+    return model, timings
@@ -0,0 +1,189 @@
+"""
+Embedding Worker Process for PITUTUR-Wicara
+Runs the embedding model in a separate process and micro-batches
+concurrent encode requests from all Streamlit sessions
+"""
+
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+from embedding_backends import load_embedding_backend
+
+logger = logging.getLogger(__name__)
+
+# Use the worker process instead of an in-process model (EMBEDDING_SERVICE=true)
+EMBEDDING_SERVICE = os.getenv("EMBEDDING_SERVICE", "false").lower() in ("1", "true", "yes")
+# Requests arriving within this window are encoded in one forward pass
+MICROBATCH_WINDOW = float(os.getenv("EMBED_MICROBATCH_MS", "5")) / 1000
+MICROBATCH_MAX_TEXTS = int(os.getenv("EMBED_MICROBATCH_MAX", "64"))
+REQUEST_TIMEOUT = 60
+START_TIMEOUT = 600
+
+_READY = "__ready__"
+
+def _collect_batch(requests, first):
+    """Gather requests that arrive within the micro-batch window"""
+    batch, count = [first], len(first[1])
+    deadline = time.monotonic() + MICROBATCH_WINDOW
+    while count < MICROBATCH_MAX_TEXTS:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = requests.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is None:
+            requests.put(None)  # let the main loop see the stop signal
+            break
+        batch.append(item)
+        count += len(item[1])
+    return batch
+
+def _worker_main(requests, responses, backend):
+    """Worker process: load the model, then serve micro-batched requests"""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="[%(asctime)s] %(name)s: %(message)s")
+    try:
+        model, timings = load_embedding_backend(backend)
+    except Exception as e:
+        responses.put((_READY, None, repr(e)))
+        return
+    responses.put((_READY, getattr(model, "backend_name", backend), timings))
+
+    while True:
+        first = requests.get()
+        if first is None:
+            return
+        batch = _collect_batch(requests, first)
+        texts = [text for _, batch_texts in batch for text in batch_texts]
+        try:
+            vectors = np.asarray(
+                model.encode(texts, batch_size=max(1, len(texts)), convert_to_numpy=True), dtype=np.float32
+            )
+        except Exception as e:
+            for request_id, _ in batch:
+                responses.put((request_id, None, repr(e)))
+            continue
+        logger.debug("Encoded micro-batch of %d requests / %d texts", len(batch), len(texts))
+        offset = 0
+        for request_id, batch_texts in batch:
+            responses.put((request_id, vectors[offset:offset + len(batch_texts)], None))
+            offset += len(batch_texts)
+
+class EmbeddingServiceClient:
+    """Model-like proxy (encode()) for the embedding worker process"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.backend_name = None
+        self.process = None
+        self._context = multiprocessing.get_context("spawn")  # never fork a torch process
+        self._requests = None
+        self._responses = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self._ready = threading.Event()
+        self._start_error = None
+        self._failed = None  # set once the worker timed out or exited; later calls fail fast
+        self._lock = threading.Lock()
+
+    def start(self, timeout=START_TIMEOUT):
+        """Start the worker and wait until its model is loaded; returns timings"""
+        self._requests = self._context.Queue()
+        self._responses = self._context.Queue()
+        self.process = self._context.Process(
+            target=_worker_main, args=(self._requests, self._responses, self.backend),
+            name="embedding-worker", daemon=True
+        )
+        self.process.start()
+        self._timings = {}
+        threading.Thread(target=self._dispatch, name="embedding-dispatch", daemon=True).start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Embedding worker did not start in time")
+        if self._start_error:
+            raise RuntimeError(f"Embedding worker failed: {self._start_error}")
+        return self._timings
+
+    def _dispatch(self):
+        """Route worker responses to the waiting callers"""
+        while True:
+            try:
+                request_id, payload, extra = self._responses.get(timeout=1.0)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    self._failed = "Embedding worker exited"
+                    self._fail_pending(RuntimeError(self._failed))
+                    self._ready.set()
+                    return
+                continue
+            if request_id == _READY:
+                if payload is None:
+                    self._start_error = extra
+                else:
+                    self.backend_name, self._timings = payload, extra
+                self._ready.set()
+                continue
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is not None:
+                if extra is not None:
+                    future.set_exception(RuntimeError(extra))
+                else:
+                    future.set_result(payload)
+
+    def _fail_pending(self, error):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def encode(self, sentences, batch_size=None, convert_to_numpy=True, **kwargs):
+        """Same call shape as SentenceTransformer.encode (numpy output)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self._failed:
+            raise RuntimeError(self._failed)
+        if self.process is None or not self.process.is_alive():
+            raise RuntimeError("Embedding worker is not running")
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        try:
+            self._requests.put((request_id, texts))
+            vectors = future.result(timeout=REQUEST_TIMEOUT)
+        except FutureTimeout:
+            # A stuck worker would make every later call wait the full timeout too
+            self._failed = f"Embedding worker did not answer within {REQUEST_TIMEOUT}s"
+            logger.error("%s; failing pending and future requests", self._failed)
+            self._fail_pending(RuntimeError(self._failed))
+            raise RuntimeError(self._failed) from None
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+        return vectors[0] if single else vectors
+
+    def close(self):
+        """Stop the worker process"""
+        if self.process is not None and self.process.is_alive():
+            self._requests.put(None)
+            self.process.join(timeout=5)
+
+def load_embedding_service(backend=None):
+    """ModelLoader load function: start the worker; returns (client, timings)"""
+    start = time.perf_counter()
+    client = EmbeddingServiceClient(backend)
+    timings = dict(client.start())
+    timings["worker_start_seconds"] = time.perf_counter() - start
+    logger.info("Embedding worker (pid %s, backend %s) ready", client.process.pid, client.backend_name)
+    return client, timings
@@ -0,0 +1,141 @@
+"""
+Quantized Embedding Store for PITUTUR-Wicara
+float32 / int8 chunk embedding matrix scored without dequantizing it
+"""
+
+import os
+import glob
+import logging
+
+import numpy as np
+
+from file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Storage precision of the index embedding matrix: int8 (default, a quarter
+# of the float32 memory at ~0.99 recall@8) or float32 (exact)
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "int8").lower()
+# Re-score this many top candidates with float32 vectors (0 = off). The
+# float32 vectors are memory-mapped from a per-KB-version file, not held in RAM
+EMBEDDING_RESCORE_CANDIDATES = int(os.getenv("EMBEDDING_RESCORE_CANDIDATES", "0"))
+EMBEDDING_RESCORE_DIR = os.path.join("knowledge_base", "embedding_index")
+RESCORE_KEEP_VERSIONS = 3
+# Rows converted to float32 at a time while scoring (bounds temporary memory)
+SCORE_BLOCK_ROWS = 8192
+
+PRECISIONS = ("float32", "int8")
+
+def rescore_path(kb_version, index_dir=EMBEDDING_RESCORE_DIR):
+    """File holding the float32 vectors of one KB version"""
+    return os.path.join(index_dir, f"float32_{kb_version}.npy")
+
+def prune_old_rescore_files(index_dir=EMBEDDING_RESCORE_DIR, keep=RESCORE_KEEP_VERSIONS):
+    """Remove all but the most recent float32 vector files"""
+    files = sorted(glob.glob(os.path.join(index_dir, "float32_*.npy")), key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _map_float32(matrix, path):
+    """Memory-map matrix from path, writing the file first if it is missing or stale"""
+    try:
+        mapped = np.load(path, mmap_mode="r")
+        # Same KB version embedded by another model/backend must not be reused
+        if mapped.shape == matrix.shape and mapped.dtype == np.float32 and (
+            not len(matrix) or np.array_equal(mapped[[0, -1]], matrix[[0, -1]])
+        ):
+            return mapped
+    except (OSError, ValueError):
+        pass
+    atomic_write(path, lambda f: np.save(f, matrix))
+    prune_old_rescore_files(os.path.dirname(path))
+    return np.load(path, mmap_mode="r")
+
+class EmbeddingStore:
+    """Read-only matrix of normalized embeddings in a compact precision"""
+
+    def __init__(self, matrix, precision=None, rescore_candidates=None, rescore_file=None):
+        precision = (precision or EMBEDDING_PRECISION).lower()
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision {precision!r} (use one of {', '.join(PRECISIONS)})")
+        matrix = np.asarray(matrix, dtype=np.float32)
+        self.precision = precision
+        self.shape = matrix.shape
+        self.rescore_candidates = EMBEDDING_RESCORE_CANDIDATES if rescore_candidates is None else rescore_candidates
+        self.scales = None
+
+        if precision == "int8":
+            # Symmetric per-vector scale: row = codes * scale
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.codes = np.round(matrix / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+        else:
+            self.codes = matrix
+
+        # Re-scoring reads float32 rows from disk; without a file it is off
+        self.full = None
+        if self.rescore_candidates > 0 and precision != "float32" and rescore_file:
+            try:
+                self.full = _map_float32(matrix, rescore_file)
+            except OSError as e:
+                logger.warning("Float32 re-score disabled, could not write %s: %s", rescore_file, e)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def dim(self):
+        return self.shape[1]
+
+    @property
+    def nbytes(self):
+        """Memory held by the store (the memory-mapped float32 file is not counted)"""
+        total = self.codes.nbytes
+        if self.scales is not None:
+            total += self.scales.nbytes
+        return total
+
+    @property
+    def can_rescore(self):
+        return self.full is not None
+
+    def freeze(self):
+        """Mark all arrays read-only (the store is shared by all sessions)"""
+        for array in (self.codes, self.scales):
+            if array is not None:
+                array.flags.writeable = False
+
+    def scores(self, query, ids=None):
+        """Dot product of a normalized query with all rows (or rows ids)"""
+        query = np.asarray(query, dtype=np.float32)
+        codes = self.codes if ids is None else self.codes[ids]
+        scales = self.scales if ids is None or self.scales is None else self.scales[ids]
+        if codes.dtype == np.float32:
+            result = codes @ query
+        else:
+            result = np.empty(len(codes), dtype=np.float32)
+            for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+                block = codes[start:start + SCORE_BLOCK_ROWS]
+                result[start:start + len(block)] = block.astype(np.float32) @ query
+        if scales is not None:
+            result *= scales
+        return result
+
+    def exact_scores(self, query, ids):
+        """float32 scores for candidate rows (falls back to stored precision)"""
+        if self.full is None:
+            return self.scores(query, ids)
+        return self.full[ids] @ np.asarray(query, dtype=np.float32)  # reads only these rows from disk
+
+    def to_float32(self):
+        """Dequantized float32 copy of the matrix"""
+        if self.full is not None:
+            return np.array(self.full)
+        matrix = self.codes.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix
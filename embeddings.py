@@ -0,0 +1,285 @@
+"""
+Embedding helpers for PITUTUR-Wicara
+Batched chunk encoding for knowledge base ingest (KB load, uploads, sync)
+and the in-memory query embedding cache
+"""
+
+import os
+import re
+import glob
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from file_utils import atomic_write
+from text_utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Number of chunks per forward pass; tune per host (CPU-only default)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+
+# On-disk chunk embedding cache (one file per embedding model)
+EMBED_CACHE_DIR = os.path.join("knowledge_base", "embedding_cache")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "50000"))
+# New vectors are appended as small segment files; this many are merged into the base file
+EMBED_CACHE_MAX_SEGMENTS = int(os.getenv("EMBED_CACHE_MAX_SEGMENTS", "16"))
+
+# In-memory LRU of query embeddings shared by all sessions
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024"))
+
+def content_hash(text):
+    """Stable content hash used as the embedding cache key"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def encode_batched(texts, model, batch_size=None):
+    """Encode texts in batches, returning (list of embeddings, stats)"""
+    texts = list(texts)
+    batch_size = max(1, batch_size or EMBED_BATCH_SIZE)
+    embeddings = [None] * len(texts)
+    stats = {"chunks": len(texts), "batch_size": batch_size, "seconds": 0.0, "chunks_per_sec": 0.0}
+    if model is None or not texts:
+        return embeddings, stats
+
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        batch = texts[offset:offset + batch_size]
+        try:
+            vectors = model.encode(batch, batch_size=batch_size, convert_to_numpy=True)
+            embeddings[offset:offset + len(batch)] = list(vectors)
+        except Exception:
+            # Fall back to one-by-one so a single bad chunk does not drop the batch
+            for i, text in enumerate(batch):
+                try:
+                    embeddings[offset + i] = model.encode(text, convert_to_numpy=True)
+                except Exception:
+                    embeddings[offset + i] = None
+
+    stats["seconds"] = time.perf_counter() - start
+    if stats["seconds"] > 0:
+        stats["chunks_per_sec"] = len(texts) / stats["seconds"]
+    logger.info(
+        "Encoded %d chunks in %.2fs (%.1f chunks/sec, batch_size=%d)",
+        stats["chunks"], stats["seconds"], stats["chunks_per_sec"], batch_size
+    )
+    return embeddings, stats
+
+def _write_vectors(path, keys, vectors):
+    """Atomically write keys and float32 vectors as one record array (.npy, mmap-able)"""
+    vectors = np.stack(vectors).astype(np.float32)
+    records = np.empty(len(keys), dtype=[("key", np.array(keys).dtype), ("vector", np.float32, vectors.shape[1:])])
+    records["key"] = keys
+    records["vector"] = vectors
+    atomic_write(path, lambda f: np.save(f, records))
+
+def _map_vectors(path):
+    """(keys, vectors) of a cache file; .npy vectors stay on disk (memory-mapped)"""
+    if path.endswith(".npz"):  # legacy layout, read into memory until compacted
+        with np.load(path, allow_pickle=False) as data:
+            return data["keys"].tolist(), data["vectors"]
+    records = np.load(path, mmap_mode="r", allow_pickle=False)
+    return records["key"].tolist(), records["vector"]
+
+class EmbeddingCache:
+    """Persistent chunk embeddings keyed by content hash.
+
+    On disk: a base file plus append-only segment files holding only the
+    vectors added by one save, so an edit costs O(changed chunks) I/O.
+    After EMBED_CACHE_MAX_SEGMENTS segments they are merged into the base.
+    Files are memory-mapped: only the key -> (file, row) index is kept in
+    RAM, vectors are read from disk when a chunk is (re)indexed.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBED_CACHE_DIR, max_entries=EMBED_CACHE_MAX_ENTRIES,
+                 max_segments=EMBED_CACHE_MAX_SEGMENTS):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.path = os.path.join(cache_dir, f"{safe_name}.npy")
+        self.segment_prefix = os.path.join(cache_dir, f"{safe_name}.seg-")
+        self.legacy_path = os.path.join(cache_dir, f"{safe_name}.npz")
+        self.max_entries = max_entries
+        self.max_segments = max_segments
+        self.rows = {}  # key -> (vectors array, row), least recently used first
+        self._unsaved = {}
+        self._segments = set()  # segment files already indexed in self.rows
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _segment_files(self, ext=".npy"):
+        return sorted(
+            glob.glob(glob.escape(self.segment_prefix) + "*" + ext),
+            key=lambda path: (os.path.getmtime(path), path)
+        )
+
+    def _index(self, path):
+        """Point the keys of one file at its rows"""
+        keys, vectors = _map_vectors(path)
+        for row, key in enumerate(keys):
+            self.rows[key] = (vectors, row)
+
+    def _load(self):
+        """Index the base file and segments (missing or corrupt files are skipped)"""
+        legacy = [self.legacy_path] + self._segment_files(".npz")
+        for path in legacy + [self.path] + self._segment_files():
+            if not os.path.exists(path):
+                continue
+            try:
+                self._index(path)
+            except Exception as e:
+                logger.warning("Ignoring unreadable embedding cache %s: %s", path, e)
+                continue
+            if path != self.path:
+                self._segments.add(path)
+        self._evict()
+        if any(path.endswith(".npz") for path in self._segments):
+            # One-time conversion of the in-memory .npz layout to mapped files
+            try:
+                self.compact()
+            except OSError as e:
+                logger.warning("Could not convert embedding cache: %s", e)
+
+    def _evict(self):
+        while len(self.rows) > self.max_entries:
+            key = next(iter(self.rows))
+            self.rows.pop(key)
+            self._unsaved.pop(key, None)
+
+    def get(self, key):
+        """Cached vector for a content hash, or None"""
+        location = self.rows.get(key)
+        if location is None:
+            return None
+        vectors, row = location
+        return vectors[row]
+
+    def save(self):
+        """Persist vectors added since the last save as a new segment"""
+        unsaved, self._unsaved = self._unsaved, {}
+        if not unsaved:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        segment = f"{self.segment_prefix}{time.time_ns()}-{os.getpid()}-{threading.get_ident()}.npy"
+        _write_vectors(segment, list(unsaved.keys()), list(unsaved.values()))
+        # Swap the in-memory vectors for the mapped segment rows
+        self._index(segment)
+        self._segments.add(segment)
+        if len(self._segments) > self.max_segments:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the base file from all indexed vectors and drop the segments it now contains.
+
+        Only segments this cache has read or written are removed; newer
+        segments from other processes stay. Two concurrent compactions can
+        still drop each other's vectors from the base, which only means
+        re-encoding them later, never a corrupt file.
+        """
+        if self.rows:
+            keys = list(self.rows.keys())
+            _write_vectors(self.path, keys, [self.get(key) for key in keys])
+            self._index(self.path)
+        for segment in self._segments:
+            try:
+                os.remove(segment)
+            except FileNotFoundError:
+                pass
+        self._segments = set()
+
+    def encode(self, texts, model, batch_size=None):
+        """Embed texts, encoding only chunks whose content hash is not cached"""
+        texts = list(texts)
+        hashes = [content_hash(text) for text in texts]
+
+        with self._lock:
+            missing = {}
+            for text, key in zip(texts, hashes):
+                if key in self.rows:
+                    # Move to the end so eviction drops the least recently used
+                    self.rows[key] = self.rows.pop(key)
+                else:
+                    missing.setdefault(key, text)
+
+            new_vectors, stats = encode_batched(missing.values(), model, batch_size=batch_size)
+            added = 0
+            for key, vector in zip(missing.keys(), new_vectors):
+                if vector is not None:
+                    vector = np.asarray(vector, dtype=np.float32)
+                    self.rows[key] = (vector[None, :], 0)
+                    self._unsaved[key] = vector
+                    added += 1
+
+            if added:
+                self._evict()
+                try:
+                    self.save()
+                except OSError as e:
+                    logger.warning("Could not persist embedding cache: %s", e)
+
+            stats["cached"] = len(texts) - len(missing)
+            stats["encoded"] = added
+            logger.info("Embedding cache: %d reused, %d newly encoded", stats["cached"], added)
+            return [self.get(key) for key in hashes], stats
+
+class QueryEmbeddingCache:
+    """LRU of query embeddings keyed by the normalized query form"""
+
+    def __init__(self, max_entries=QUERY_EMBED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.vectors = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._model_id = None
+        self._lock = threading.Lock()
+
+    def encode(self, query, model):
+        """Embedding of a query; cached forms skip the model entirely"""
+        key = normalize_query(query)
+        with self._lock:
+            if self._model_id != id(model):
+                # A different model (e.g. another backend) gives different vectors
+                self.vectors.clear()
+                self._model_id = id(model)
+            vector = self.vectors.get(key)
+            if vector is not None:
+                self.vectors.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = np.asarray(model.encode(query, convert_to_numpy=True), dtype=np.float32)
+        vector.flags.writeable = False  # shared between sessions
+        with self._lock:
+            if self._model_id == id(model):
+                self.vectors[key] = vector
+                self.vectors.move_to_end(key)
+                while len(self.vectors) > self.max_entries:
+                    self.vectors.popitem(last=False)
+        return vector
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.vectors),
+        }
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+def get_query_embedding_cache():
+    """Return the process-wide query embedding cache"""
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryEmbeddingCache()
+    return _query_cache
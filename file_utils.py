@@ -0,0 +1,29 @@
+"""
+File Utilities for PITUTUR-Wicara
+Atomic file writes shared by the KB store, version store and on-disk caches
+"""
+
+import os
+import json
+import threading
+
+def atomic_write(path, write, mode="wb"):
+    """Call write(f) on a per-writer temp file, then rename it over path.
+
+    Readers never see half a file, and concurrent writers (app, admin,
+    precompute job) never share a temp file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_json_atomic(path, data):
+    """Atomically write data as indented UTF-8 JSON"""
+    atomic_write(path, lambda f: json.dump(data, f, indent=2, ensure_ascii=False), mode="w")
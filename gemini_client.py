@@ -0,0 +1,112 @@
+"""
+Gemini REST Client for PITUTUR-Wicara
+Process-wide pooled, keep-alive HTTP session shared by all sessions and models
+"""
+
+import os
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GEMINI_HOST = "https://generativelanguage.googleapis.com"
+GEMINI_API_BASE = f"{GEMINI_HOST}/v1/models"
+GEMINI_MODELS = [
+    "gemini-2.5-flash",
+    "gemini-2.0-flash",
+    "gemini-2.5-flash-lite",
+    "gemini-2.0-flash-lite",
+]
+
+# Separate connect/read timeouts: fail fast on an unreachable host,
+# but give generation time to finish
+CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "30"))
+
+# Keep-alive pool sizes for the Gemini host (roughly max concurrent requests)
+POOL_CONNECTIONS = int(os.getenv("GEMINI_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("GEMINI_POOL_MAXSIZE", "32"))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """Return the shared keep-alive session (created on first use)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    pool_block=False
+                )
+                session.mount(GEMINI_HOST, adapter)
+                session.headers.update({'Content-Type': 'application/json'})
+                _session = session
+    return _session
+
+def build_request_body(prompt):
+    """Gemini REST request body for a single-turn prompt"""
+    return {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+
+def extract_candidate_text(result):
+    """Concatenate the text parts of the first candidate in a Gemini response"""
+    candidates = result.get('candidates') or []
+    if not candidates:
+        return ""
+    parts = candidates[0].get('content', {}).get('parts', [])
+    return "".join(part.get('text', '') for part in parts)
+
+def _error_from_response(response):
+    """Best-effort error payload from a non-200 response"""
+    try:
+        return response.json() if response.content else "Unknown error"
+    except ValueError:
+        return response.text or f"HTTP {response.status_code}"
+
+def generate_content(model_name, prompt, api_key):
+    """Blocking :generateContent call; returns (text, error)"""
+    url = f"{GEMINI_API_BASE}/{model_name}:generateContent"
+    response = get_http_session().post(
+        url,
+        params={"key": api_key},
+        json=build_request_body(prompt),
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    )
+    if response.status_code != 200:
+        return None, _error_from_response(response)
+    text = extract_candidate_text(response.json())
+    return (text, None) if text else (None, "Empty response")
+
+def stream_generate_content(model_name, prompt, api_key):
+    """Streaming :streamGenerateContent call (SSE), yielding text pieces.
+
+    Raises RuntimeError before yielding anything if the model rejects the request.
+    """
+    url = f"{GEMINI_API_BASE}/{model_name}:streamGenerateContent"
+    with get_http_session().post(
+        url,
+        params={"key": api_key, "alt": "sse"},
+        json=build_request_body(prompt),
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(_error_from_response(response))
+
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            text = extract_candidate_text(json.loads(line[len("data:"):]))
+            if text:
+                yield text
@@ -0,0 +1,162 @@
+"""
+Knowledge Base Pipeline for PITUTUR-Wicara
+Chunking, embedding and prompt building shared by the chatbot,
+the admin dashboard and the sync job
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+
+from embeddings import encode_batched, get_query_embedding_cache
+from chunker import chunk_sections
+from chunk_store import ChunkStore
+from context_packer import pack_context
+from context_compressor import COMPRESSION_ENABLED, attach_sentence_embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+KNOWLEDGE_BASE_DIR = "knowledge_base"
+CURRENT_KB_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "current_knowledge.json")
+
+BUILTIN_FILENAME = "📘 Pengetahuan BI Purwokerto (Built-in)"
+
+# Example-question buttons; answers are precomputed on every KB publish.
+# Override with knowledge_base/canonical_questions.json (same structure).
+CANONICAL_QUESTIONS_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "canonical_questions.json")
+EXAMPLE_QUESTIONS = [
+    {"label": "🤖 Apa itu PITUTUR-Wicara?", "query": "Apa itu PITUTUR-Wicara dan bagaimana cara menggunakannya?", "column": 1},
+    {"label": "🏛️ Tentang Bank Indonesia", "query": "Apa itu Bank Indonesia?", "column": 1},
+    {"label": "📍 Informasi Kantor Perwakilan Bank Indonesia Purwokerto", "query": "Informasi Kantor Perwakilan Bank Indonesia Purwokerto", "column": 1},
+    {"label": "💼 Layanan yang tersedia di Bank Indonesia Purwokerto", "query": "Layanan apa saja yang tersedia di Bank Indonesia Purwokerto?", "column": 1},
+    {"label": "🎓 Magang dan PKL", "query": "Bagaimana cara mendaftar magang atau PKL di Bank Indonesia Purwokerto?", "column": 2},
+    {"label": "📢 Survei, Pengaduan, dan Informasi Publik", "query": "Bagaimana cara menyampaikan pengaduan atau mengakses informasi publik?", "column": 2},
+]
+
+def load_canonical_questions():
+    """Load the canonical (example button) questions"""
+    if os.path.exists(CANONICAL_QUESTIONS_FILE):
+        try:
+            with open(CANONICAL_QUESTIONS_FILE, 'r', encoding='utf-8') as f:
+                questions = json.load(f)
+            if questions:
+                return questions
+        except (OSError, ValueError):
+            pass
+    return EXAMPLE_QUESTIONS
+
+def kb_to_text(kb_data):
+    """Flatten KB sections into the text format used for chunking"""
+    text_content = "INFORMASI BANK INDONESIA KANTOR PERWAKILAN PURWOKERTO\n\n"
+    for section in kb_data.get("sections", []):
+        text_content += "=" * 47 + "\n"
+        text_content += section.get("title", "").upper() + "\n"
+        text_content += "=" * 47 + "\n\n"
+        text_content += section.get("content", "") + "\n\n"
+    
+    return text_content
+
+def kb_sections(kb_data):
+    """KB sections for chunking, titled the same way as in the flattened text"""
+    return [
+        {'title': section.get("title", "").upper().strip(), 'content': section.get("content", "").strip()}
+        for section in kb_data.get("sections", [])
+    ]
+
+def get_kb_version(knowledge_text):
+    """Short content hash identifying a KB version"""
+    return hashlib.md5(knowledge_text.encode()).hexdigest()[:8]
+
+def build_documents(sections, model=None, cache=None, sentence_embeddings=COMPRESSION_ENABLED):
+    """Chunk and embed KB sections into the ChunkStore used by KBIndex"""
+    # Chunk each section separately so an edit only changes that section's chunks
+    chunks = chunk_sections(sections)
+    embeddings = _encode_texts([c['text'] for c in chunks], model, cache) if model is not None else None
+    store = ChunkStore(chunks, embeddings, filename=BUILTIN_FILENAME, id_prefix="builtin_purwokerto")
+    # Sentence embeddings for query-focused context compression
+    if sentence_embeddings and model is not None:
+        attach_sentence_embeddings(store, lambda texts: _encode_texts(texts, model, cache))
+    return store
+
+def _encode_texts(texts, model, cache=None, batch_size=None):
+    """Embed texts in batches, through the embedding cache when one is given"""
+    if cache is not None:
+        return cache.encode(texts, model, batch_size=batch_size)[0]
+    return encode_batched(texts, model, batch_size=batch_size)[0]
+
+def split_kb_sections(text):
+    """Split flattened KB text at its '=====' section headers"""
+    blocks = re.split(r'(?m)^(?==+\n[^\n]*\n=+\n)', text)
+    return [block for block in blocks if block.strip()]
+
+def text_to_sections(text):
+    """Recover {title, content} sections from flattened KB text (hardcoded fallback KB)"""
+    sections = []
+    for block in split_kb_sections(text):
+        match = re.match(r'=+\n([^\n]*)\n=+\n(.*)', block, re.S)
+        if match:
+            sections.append({'title': match.group(1).strip(), 'content': match.group(2).strip()})
+        elif len(block.strip().splitlines()) > 1:
+            # Free text before the first header (a lone title line is dropped)
+            sections.append({'title': '', 'content': block.strip()})
+    return sections
+
+def encode_query(query, model=None):
+    """Embed a user query via the shared LRU (None if the model is unavailable)"""
+    if model is None:
+        return None
+    try:
+        return get_query_embedding_cache().encode(query, model)
+    except:
+        return None
+
+def build_prompt(user_message, relevant_docs):
+    """Build the Gemini prompt from the question and retrieved chunks"""
+    # Build context from relevant documents (merged and cut to the token budget)
+    context = ""
+    if relevant_docs:
+        relevant_docs, stats = pack_context(relevant_docs)
+        logger.info(
+            "Context packed: %d -> %d docs, %d -> %d tokens (%d saved)",
+            stats['retrieved'], stats['packed'], stats['tokens_in'], stats['tokens_out'], stats['tokens_saved']
+        )
+        context = "Informasi dari dokumen Bank Indonesia:\n\n"
+        for i, doc in enumerate(relevant_docs):
+            parts = f"{doc['index']+1}-{doc['last_index']+1}" if doc.get('last_index', doc['index']) != doc['index'] else f"{doc['index']+1}"
+            context += f"[Dokumen {i+1}: {doc['filename']}, Bagian {parts}/{doc['total_chunks']}]\n"
+            context += f"{doc['chunk']}\n\n"
+    
+    # Build prompt
+    if context:
+        prompt = f"""Kamu adalah asisten chatbot Bank Indonesia Perwakilan Purwokerto yang membantu menjawab pertanyaan.
+
+INFORMASI DARI DOKUMEN:
+{context}
+
+PERTANYAAN: {user_message}
+
+INSTRUKSI PENTING:
+- WAJIB gunakan HANYA informasi dari dokumen di atas untuk menjawab
+- Jika informasi ada di dokumen, jawab dengan detail dan lengkap dari dokumen tersebut
+- JANGAN katakan "informasi tidak tersedia" jika sudah ada di dokumen
+- Jawab dengan struktur yang jelas menggunakan bullet points dan numbering
+- Berikan informasi praktis yang bisa langsung digunakan
+- Sertakan nomor kontak, alamat, atau link yang relevan dari dokumen
+- Jawab dalam Bahasa Indonesia yang ramah dan profesional
+- Jika memang benar-benar tidak ada di dokumen, baru katakan tidak tersedia dan sarankan menghubungi kantor"""
+    else:
+        prompt = f"""Kamu adalah asisten chatbot Bank Indonesia yang membantu menjawab pertanyaan.
+
+Pertanyaan: {user_message}
+
+Instruksi:
+- Jawab berdasarkan pengetahuan umum tentang Bank Indonesia
+- Berikan informasi yang akurat dan bermanfaat
+- Sertakan link ke website resmi bi.go.id untuk informasi lebih lanjut
+- Jawab dalam Bahasa Indonesia dengan ramah dan profesional"""
+    
+    return prompt
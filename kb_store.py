@@ -0,0 +1,331 @@
+"""
+Knowledge Base Store for PITUTUR-Wicara
+JSON file (default) or SQLite (WAL) storage for current_knowledge sections
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+
+from kb_pipeline import KNOWLEDGE_BASE_DIR, CURRENT_KB_FILE
+from file_utils import write_json_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks
+    fcntl = None
+
+# json = current_knowledge.json is the store; sqlite = knowledge.db is the
+# store and current_knowledge.json is an exported snapshot for readers
+KB_STORE = os.getenv("KB_STORE", "json").lower()
+KB_DB_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "knowledge.db")
+SQLITE_BUSY_TIMEOUT_MS = 10000
+
+def empty_kb():
+    return {"sections": [], "last_updated": None, "version": "1.0.0"}
+
+def _matches(existing, section, keys):
+    return all(existing.get(key) == section.get(key) for key in keys)
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on path (serializes writers across processes)"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+class JSONKBStore:
+    """current_knowledge.json with atomic writes and a writer lock file"""
+
+    def __init__(self, path=CURRENT_KB_FILE):
+        self.path = path
+
+    def _locked(self):
+        """Serialize read-modify-write cycles between processes"""
+        return file_lock(self.path + ".lock")
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return empty_kb()
+
+    def save(self, kb_data):
+        """Replace the whole knowledge base"""
+        with self._locked():
+            write_json_atomic(self.path, kb_data)
+        return kb_data
+
+    def _modify(self, change):
+        with self._locked():
+            kb_data = self.load()
+            kb_data.setdefault("sections", [])
+            change(kb_data)
+            write_json_atomic(self.path, kb_data)
+        return kb_data
+
+    def add_section(self, section):
+        return self._modify(lambda kb: kb["sections"].append(section))
+
+    def update_section(self, index, fields):
+        return self._modify(lambda kb: kb["sections"][index].update(fields))
+
+    def delete_section(self, index):
+        return self._modify(lambda kb: kb["sections"].pop(index))
+
+    def upsert_section(self, section, keys):
+        """Replace the section matching section on all keys, or append it; returns (kb_data, replaced)"""
+        replaced = []
+        def change(kb):
+            for idx, existing in enumerate(kb["sections"]):
+                if _matches(existing, section, keys):
+                    kb["sections"][idx] = section
+                    replaced.append(idx)
+                    return
+            kb["sections"].append(section)
+        return self._modify(change), bool(replaced)
+
+    def set_meta(self, **meta):
+        """Update top-level fields (last_updated, version, ...)"""
+        return self._modify(lambda kb: kb.update(meta))
+
+    def import_json(self, path):
+        """Replace the store's content with a current_knowledge.json file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.save(json.load(f))
+
+    def export_json(self, path):
+        """Write the store's content as a current_knowledge.json file"""
+        kb_data = self.load()
+        write_json_atomic(path, kb_data)
+        return kb_data
+
+class SQLiteKBStore:
+    """One row per section plus a revision counter, in WAL mode.
+
+    Readers never block writers and every change is one transaction;
+    after each write the KB is exported to current_knowledge.json so the
+    chatbot, GitHub push and downloads keep working unchanged.
+    """
+
+    def __init__(self, db_path=KB_DB_FILE, json_path=CURRENT_KB_FILE, mirror_json=True):
+        self.db_path = db_path
+        self.json_path = json_path
+        self.mirror_json = mirror_json
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sections (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    position INTEGER NOT NULL,
+                    title TEXT NOT NULL DEFAULT '',
+                    content TEXT NOT NULL DEFAULT '',
+                    extra TEXT NOT NULL DEFAULT '{}'
+                );
+                CREATE INDEX IF NOT EXISTS sections_position ON sections(position);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', '0');
+            """)
+            empty = conn.execute("SELECT COUNT(*) FROM sections").fetchone()[0] == 0
+        finally:
+            conn.close()
+        # First use: import the existing JSON knowledge base
+        if empty and self.revision() == 0 and os.path.exists(json_path):
+            self.import_json(json_path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Write transaction (BEGIN IMMEDIATE) that bumps the revision.
+
+        The JSON export happens before COMMIT, while this connection holds
+        the write lock, so exports from concurrent writers cannot interleave.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+            if self.mirror_json:
+                write_json_atomic(self.json_path, self._read(conn))
+            conn.execute("COMMIT")
+        except BaseException:
+            # BEGIN IMMEDIATE itself may fail (busy) with no transaction open
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row(section):
+        extra = {k: v for k, v in section.items() if k not in ("title", "content")}
+        return section.get("title", ""), section.get("content", ""), json.dumps(extra, ensure_ascii=False)
+
+    @staticmethod
+    def _section_id(conn, index):
+        row = conn.execute("SELECT id FROM sections ORDER BY position, id LIMIT 1 OFFSET ?", (index,)).fetchone()
+        if row is None:
+            raise IndexError(f"section index {index} out of range")
+        return row[0]
+
+    def revision(self):
+        """Counter incremented by every committed change"""
+        conn = self._connect()
+        try:
+            return int(conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0])
+        finally:
+            conn.close()
+
+    def load(self):
+        """Consistent snapshot of the whole KB in the JSON structure"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            kb_data = self._read(conn)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return kb_data
+
+    @staticmethod
+    def _read(conn):
+        meta = dict(conn.execute("SELECT key, value FROM meta WHERE key != 'revision'").fetchall())
+        rows = conn.execute("SELECT title, content, extra FROM sections ORDER BY position, id").fetchall()
+        kb_data = empty_kb()
+        kb_data.update({key: json.loads(value) for key, value in meta.items()})
+        kb_data["sections"] = [dict(json.loads(extra), title=title, content=content) for title, content, extra in rows]
+        return kb_data
+
+    def save(self, kb_data):
+        """Replace the whole knowledge base in one transaction"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM sections")
+            conn.execute("DELETE FROM meta WHERE key != 'revision'")
+            conn.executemany(
+                "INSERT INTO sections (position, title, content, extra) VALUES (?, ?, ?, ?)",
+                [(i,) + self._row(section) for i, section in enumerate(kb_data.get("sections", []))]
+            )
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False)) for key, value in kb_data.items() if key != "sections"]
+            )
+        return kb_data
+
+    def add_section(self, section):
+        with self._write() as conn:
+            position = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM sections").fetchone()[0]
+            conn.execute(
+                "INSERT INTO sections (position, title, content, extra) VALUES (?, ?, ?, ?)",
+                (position,) + self._row(section)
+            )
+        return self.load()
+
+    def update_section(self, index, fields):
+        """Update one section's fields; other sections are not rewritten"""
+        with self._write() as conn:
+            section_id = self._section_id(conn, index)
+            title, content, extra = conn.execute(
+                "SELECT title, content, extra FROM sections WHERE id = ?", (section_id,)
+            ).fetchone()
+            section = dict(json.loads(extra), title=title, content=content)
+            section.update(fields)
+            conn.execute(
+                "UPDATE sections SET title = ?, content = ?, extra = ? WHERE id = ?",
+                self._row(section) + (section_id,)
+            )
+        return self.load()
+
+    def delete_section(self, index):
+        with self._write() as conn:
+            conn.execute("DELETE FROM sections WHERE id = ?", (self._section_id(conn, index),))
+        return self.load()
+
+    def upsert_section(self, section, keys):
+        """Replace the section matching section on all keys, or append it; returns (kb_data, replaced)"""
+        with self._write() as conn:
+            rows = conn.execute("SELECT id, title, content, extra FROM sections ORDER BY position, id").fetchall()
+            match = next((
+                row_id for row_id, title, content, extra in rows
+                if _matches(dict(json.loads(extra), title=title, content=content), section, keys)
+            ), None)
+            if match is not None:
+                conn.execute(
+                    "UPDATE sections SET title = ?, content = ?, extra = ? WHERE id = ?",
+                    self._row(section) + (match,)
+                )
+            else:
+                position = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM sections").fetchone()[0]
+                conn.execute(
+                    "INSERT INTO sections (position, title, content, extra) VALUES (?, ?, ?, ?)",
+                    (position,) + self._row(section)
+                )
+        return self.load(), match is not None
+
+    def set_meta(self, **meta):
+        """Update top-level fields (last_updated, version, ...)"""
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False)) for key, value in meta.items()]
+            )
+        return self.load()
+
+    def import_json(self, path):
+        """Replace the store's content with a current_knowledge.json file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.save(json.load(f))
+
+    def export_json(self, path):
+        """Write the store's content as a current_knowledge.json file"""
+        kb_data = self.load()
+        write_json_atomic(path, kb_data)
+        return kb_data
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_kb_store():
+    """Return the configured knowledge base store (KB_STORE=json|sqlite)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteKBStore() if KB_STORE == "sqlite" else JSONKBStore()
+    return _store
+
+def main():
+    parser = argparse.ArgumentParser(description="Import/export the knowledge base store (KB_STORE=json|sqlite)")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="current_knowledge.json file to read (import) or write (export)")
+    args = parser.parse_args()
+
+    store = get_kb_store()
+    if args.command == "import":
+        kb_data = store.import_json(args.path)
+        print(f"Imported {len(kb_data.get('sections', []))} sections from {args.path}")
+    else:
+        kb_data = store.export_json(args.path)
+        print(f"Exported {len(kb_data.get('sections', []))} sections to {args.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Knowledge Base File Watcher for PITUTUR-Wicara
+Publishes a new KB version only when current_knowledge.json content changes
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+
+from kb_pipeline import CURRENT_KB_FILE, kb_to_text, kb_sections, get_kb_version
+
+logger = logging.getLogger(__name__)
+
+# Seconds between os.stat() checks; the file is only read when mtime/size change
+KB_WATCH_INTERVAL = float(os.getenv("KB_WATCH_INTERVAL", "1"))
+
+KBSnapshot = namedtuple("KBSnapshot", "text sections version content_hash loaded_at")
+
+class KBWatcher:
+    """Watches the KB JSON file and holds the parsed current version.
+
+    Readers call current() and get the last published snapshot without
+    touching the file. A background thread stats the file; only an
+    mtime/size change triggers a read, and only a content hash change
+    triggers parsing and a new version.
+    """
+
+    def __init__(self, path=CURRENT_KB_FILE, interval=KB_WATCH_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.error = None
+        self._snapshot = None
+        self._stat_key = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Load the current file synchronously, then watch in the background"""
+        self.check()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kb-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, callback):
+        """Call callback(snapshot) whenever a new version is published"""
+        self._subscribers.append(callback)
+
+    def current(self):
+        """Last published snapshot (None if the file does not exist)"""
+        return self._snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning("KB watcher check failed: %s", e)
+
+    def check(self):
+        """Publish a new snapshot if the file content changed; returns it or None"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            with self._lock:
+                if self._stat_key is not None:
+                    logger.warning("%s removed; keeping the last loaded KB version", self.path)
+                self._stat_key = None
+            return None
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key == self._stat_key:
+            return None
+
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        content_hash = hashlib.sha1(raw).hexdigest()
+        with self._lock:
+            self._stat_key = stat_key
+            if self._snapshot is not None and self._snapshot.content_hash == content_hash:
+                return None  # touched or rewritten with identical content
+
+        try:
+            kb_data = json.loads(raw.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as e:
+            # Probably caught mid-write; the finished write changes mtime/size again
+            self.error = e
+            logger.warning("Ignoring unreadable %s: %s", self.path, e)
+            return None
+
+        text = kb_to_text(kb_data)
+        snapshot = KBSnapshot(text, kb_sections(kb_data), get_kb_version(text), content_hash, time.time())
+        with self._lock:
+            previous, self._snapshot = self._snapshot, snapshot
+        self.error = None
+        if previous is None or previous.version != snapshot.version:
+            logger.info("Published KB version %s", snapshot.version)
+            for callback in list(self._subscribers):
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    logger.warning("KB subscriber failed: %s", e)
+        return snapshot
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def get_kb_watcher():
+    """Return the process-wide KB watcher (started on first use)"""
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                _watcher = KBWatcher().start()
+    return _watcher
@@ -3,11 +3,12 @@ Migration Script: Convert existing hardcoded knowledge base to JSON format
 Run this once to migrate from BUILTIN_KNOWLEDGE text to JSON structure
 """
 
-import json
 import os
 from datetime import datetime
 import re
 
+from kb_store import KB_STORE, KB_DB_FILE, get_kb_store
+
 KNOWLEDGE_BASE_DIR = "knowledge_base"
 CURRENT_KB_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "current_knowledge.json")
 
@@ -289,12 +290,11 @@ def migrate():
         "migration_date": datetime.now().isoformat()
     }
     
-    # Save to JSON
-    with open(CURRENT_KB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(kb_data, f, indent=2, ensure_ascii=False)
+    # Save through the configured store (KB_STORE=sqlite also refreshes the JSON export)
+    get_kb_store().save(kb_data)
     
     print(f"✅ Migration complete!")
-    print(f"✅ Knowledge base saved to: {CURRENT_KB_FILE}")
+    print(f"✅ Knowledge base saved to: {KB_DB_FILE if KB_STORE == 'sqlite' else CURRENT_KB_FILE}")
     print(f"✅ Total sections: {len(sections)}")
     
     # Print section titles
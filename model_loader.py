@@ -0,0 +1,89 @@
+"""
+Background Embedding Model Loader for PITUTUR-Wicara
+Imports, loads and warms up the embedding model off the UI thread
+"""
+
+import time
+import logging
+import threading
+
+from embedding_backends import load_embedding_backend
+from embedding_service import EMBEDDING_SERVICE, load_embedding_service
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXT = "Apa itu Bank Indonesia?"
+
+class ModelLoader:
+    """Loads the embedding model once in a daemon thread.
+
+    Until the model is ready `model` is None and callers fall back to
+    keyword-only retrieval.
+    """
+
+    def __init__(self, load_fn=load_embedding_backend):
+        self.load_fn = load_fn
+        self.model = None
+        self.error = None
+        self.metrics = {}
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start loading in the background (no-op if already started)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="embedding-model-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            model, timings = self.load_fn()
+            warmup_start = time.perf_counter()
+            # First encode pays for lazy initialisation; do it before real queries
+            model.encode(WARMUP_TEXT, convert_to_numpy=True)
+            timings["warmup_seconds"] = time.perf_counter() - warmup_start
+            timings["total_seconds"] = time.perf_counter() - start
+            self.metrics = timings
+            self.model = model
+            logger.info(
+                "Embedding model ready in %.2fs (import %.2fs, load %.2fs, warm-up %.2fs)",
+                timings["total_seconds"], timings.get("import_seconds", 0.0),
+                timings.get("load_seconds", 0.0), timings["warmup_seconds"]
+            )
+        except Exception as e:
+            self.error = e
+            logger.warning("Embedding model failed to load after %.2fs: %s", time.perf_counter() - start, e)
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self.model is not None
+
+    @property
+    def finished(self):
+        """True once loading has either succeeded or failed"""
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """Block until loading finishes; returns the model or None"""
+        self._ready.wait(timeout)
+        return self.model
+
+_loader = None
+_loader_lock = threading.Lock()
+
+def get_model_loader():
+    """Return the process-wide model loader (started on first use)"""
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                # Worker process (micro-batched) or in-process model
+                load_fn = load_embedding_service if EMBEDDING_SERVICE else load_embedding_backend
+                _loader = ModelLoader(load_fn).start()
+    return _loader
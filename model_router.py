@@ -0,0 +1,279 @@
+"""
+Model Router for PITUTUR-Wicara
+Circuit-breaking, latency-aware ordering of the Gemini fallback chain
+"""
+
+import os
+import re
+import time
+import queue
+import logging
+import threading
+from collections import deque
+
+from gemini_client import GEMINI_MODELS, generate_content, stream_generate_content, get_http_session
+from check_models import list_generate_models
+
+logger = logging.getLogger(__name__)
+
+# Preferred order; discovery (check_models) filters it to what the key can use
+MODEL_PREFERENCE = [m.strip() for m in os.getenv("GEMINI_MODEL_PREFERENCE", ",".join(GEMINI_MODELS)).split(",") if m.strip()]
+# Other discovered models matching this pattern are appended as extra fallbacks
+DISCOVERY_PATTERN = re.compile(os.getenv("GEMINI_MODEL_PATTERN", r"^gemini-[\d.]+-flash(-lite)?$"))
+DISCOVERY_TTL = 3600
+
+# Health tracking and circuit breaker
+STATS_WINDOW = 50            # recent calls kept per model
+MIN_SAMPLES = 5              # calls before the error rate is trusted
+ERROR_RATE_THRESHOLD = 0.5
+FAILURE_THRESHOLD = 3        # consecutive failures that open the circuit
+CIRCUIT_OPEN_SECONDS = 30    # first open; doubles on each re-open
+CIRCUIT_MAX_OPEN_SECONDS = 300
+SLOW_MODEL_P90 = float(os.getenv("GEMINI_SLOW_MODEL_P90", "20"))
+
+# Start a second model if the first has not answered after this many
+# seconds (0 = hedging disabled)
+HEDGE_AFTER_SECONDS = float(os.getenv("GEMINI_HEDGE_AFTER", "0"))
+
+def error_status(error):
+    """HTTP status code carried in a Gemini error payload, if any"""
+    payload = error.args[0] if isinstance(error, Exception) and error.args else error
+    if isinstance(payload, dict):
+        return payload.get('error', {}).get('code')
+    return None
+
+class ModelHealth:
+    """Rolling success/latency window and circuit state for one model"""
+
+    def __init__(self):
+        self.outcomes = deque(maxlen=STATS_WINDOW)  # (success, latency)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.open_count = 0
+
+    def record(self, success, latency):
+        self.outcomes.append((success, latency))
+        if success:
+            self.consecutive_failures = 0
+            self.open_count = 0
+        else:
+            self.consecutive_failures += 1
+
+    def open_circuit(self, now):
+        duration = min(CIRCUIT_OPEN_SECONDS * (2 ** self.open_count), CIRCUIT_MAX_OPEN_SECONDS)
+        self.open_until = now + duration
+        self.open_count += 1
+        return duration
+
+    def is_open(self, now):
+        return now < self.open_until
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for success, _ in self.outcomes if not success) / len(self.outcomes)
+
+    def latency_percentile(self, p):
+        latencies = sorted(latency for success, latency in self.outcomes if success)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))]
+
+class ModelRouter:
+    """Process-wide router shared by all sessions"""
+
+    def __init__(self, preference=None, hedge_after=HEDGE_AFTER_SECONDS):
+        self.preference = list(preference or MODEL_PREFERENCE)
+        self.hedge_after = hedge_after
+        self.models = list(self.preference)
+        self.health = {}
+        self._discovered_at = 0.0
+        self._lock = threading.Lock()
+
+    def discover(self, api_key):
+        """Refresh the model list in the background when stale (never blocks a request)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._discovered_at and now - self._discovered_at < DISCOVERY_TTL:
+                return
+            self._discovered_at = now
+        threading.Thread(target=self._discover, args=(api_key,), name="model-discovery", daemon=True).start()
+
+    def _discover(self, api_key):
+        """Seed the model list from the models endpoint (see check_models.py)"""
+        try:
+            available = list_generate_models(api_key, timeout=5, session=get_http_session())
+        except Exception as e:
+            logger.warning("Model discovery failed, using preference list: %s", e)
+            return
+        models = [m for m in self.preference if m in available]
+        models += [m for m in available if m not in models and DISCOVERY_PATTERN.match(m)]
+        if models:
+            with self._lock:
+                self.models = models
+            logger.info("Model router seeded with: %s", ", ".join(models))
+
+    def _health(self, model_name):
+        return self.health.setdefault(model_name, ModelHealth())
+
+    def ordered_models(self):
+        """Models to try, healthy first, slow or open-circuit models last"""
+        now = time.monotonic()
+        with self._lock:
+            healthy, slow, tripped = [], [], []
+            for model_name in self.models:
+                health = self._health(model_name)
+                p90 = health.latency_percentile(90)
+                if health.is_open(now):
+                    tripped.append(model_name)
+                elif p90 is not None and p90 > SLOW_MODEL_P90:
+                    slow.append(model_name)
+                else:
+                    healthy.append(model_name)
+            # If every circuit is open, still try them (soonest to close first)
+            tripped.sort(key=lambda m: self.health[m].open_until)
+            return healthy + slow + (tripped if not (healthy or slow) else [])
+
+    def record_success(self, model_name, latency):
+        with self._lock:
+            self._health(model_name).record(True, latency)
+
+    def record_failure(self, model_name, latency, error=None):
+        now = time.monotonic()
+        with self._lock:
+            health = self._health(model_name)
+            health.record(False, latency)
+            rate_limited = error_status(error) == 429
+            failing = (
+                health.consecutive_failures >= FAILURE_THRESHOLD
+                or (len(health.outcomes) >= MIN_SAMPLES and health.error_rate >= ERROR_RATE_THRESHOLD)
+            )
+            if rate_limited or failing:
+                duration = health.open_circuit(now)
+                logger.warning("Circuit opened for %s for %ds (%s)", model_name, duration, error)
+
+    def stats(self):
+        """Per-model health snapshot (error rate, latency percentiles, circuit)"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model_name: {
+                    "calls": len(health.outcomes),
+                    "error_rate": round(health.error_rate, 3),
+                    "p50": health.latency_percentile(50),
+                    "p90": health.latency_percentile(90),
+                    "p99": health.latency_percentile(99),
+                    "circuit_open": health.is_open(now),
+                }
+                for model_name, health in self.health.items()
+            }
+
+    def _race(self, call, api_key):
+        """Relay pieces from the first model that answers.
+
+        call(model_name) returns a generator of text pieces. Models are
+        tried in router order; if an attempt is still silent after
+        hedge_after seconds one extra model is started and whichever
+        produces text first wins; after that, every failed attempt is
+        replaced by the next model at once, so two stay in flight.
+        Raises RuntimeError(last_error) if all fail.
+        """
+        self.discover(api_key)  # background; this request uses the current list
+        candidates = self.ordered_models()
+        events = queue.Queue()
+        cancelled = set()
+        started = []
+        state = {"active": 0, "hedged": False}
+
+        def worker(model_name):
+            start = time.monotonic()
+            answered = False
+            stream = call(model_name)
+            try:
+                for text in stream:
+                    if model_name in cancelled:
+                        return
+                    if not answered:
+                        answered = True
+                        self.record_success(model_name, time.monotonic() - start)
+                    events.put(('text', model_name, text))
+                if not answered:
+                    raise RuntimeError("Empty response")
+                events.put(('done', model_name, None))
+            except Exception as e:
+                if not answered:
+                    self.record_failure(model_name, time.monotonic() - start, e)
+                events.put(('error', model_name, e))
+            finally:
+                stream.close()
+
+        def launch():
+            model_name = candidates.pop(0)
+            started.append(model_name)
+            state["active"] += 1
+            threading.Thread(target=worker, args=(model_name,), daemon=True).start()
+
+        winner = None
+        last_error = None
+        launch()
+        try:
+            while True:
+                can_hedge = (
+                    winner is None and candidates and state["active"] == 1
+                    and not state["hedged"] and self.hedge_after > 0
+                )
+                try:
+                    kind, model_name, payload = events.get(timeout=self.hedge_after if can_hedge else None)
+                except queue.Empty:
+                    logger.info("Hedging: starting %s after %.1fs", candidates[0], self.hedge_after)
+                    state["hedged"] = True
+                    launch()
+                    continue
+
+                if winner is None and kind == 'text':
+                    winner = model_name
+                    cancelled.update(m for m in started if m != winner)
+                if model_name in cancelled:
+                    continue
+
+                if kind == 'text':
+                    yield payload
+                elif kind == 'done':
+                    return
+                else:
+                    state["active"] -= 1
+                    if model_name == winner:
+                        raise payload
+                    last_error = payload
+                    if candidates and (state["active"] == 0 or state["hedged"]):
+                        launch()
+                    elif state["active"] == 0:
+                        raise RuntimeError(last_error.args[0] if last_error.args else str(last_error))
+        finally:
+            cancelled.update(started)
+
+    def stream(self, prompt, api_key):
+        """Stream answer pieces from the best available model"""
+        return self._race(lambda m: stream_generate_content(m, prompt, api_key), api_key)
+
+    def generate(self, prompt, api_key):
+        """Blocking answer from the best available model"""
+        def call(model_name):
+            text, error = generate_content(model_name, prompt, api_key)
+            if not text:
+                raise RuntimeError(error)
+            yield text
+        return "".join(self._race(call, api_key))
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    """Return the process-wide model router"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
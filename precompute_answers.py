@@ -0,0 +1,150 @@
+"""
+Precompute Answers for Canonical Questions
+Runs after every KB publish (admin save/restore and auto-sync) so the
+example-question buttons answer instantly from the stored answers
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import subprocess
+from datetime import datetime
+
+from kb_pipeline import (
+    KNOWLEDGE_BASE_DIR, CURRENT_KB_FILE, load_canonical_questions,
+    kb_to_text, kb_sections, get_kb_version, build_documents, encode_query, build_prompt
+)
+from context_compressor import COMPRESSION_ENABLED, compress_docs
+from answer_cache import (
+    load_precomputed_answers, save_precomputed_answers
+)
+from text_utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Prevents overlapping runs when several publishes happen close together
+LOCK_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "answer_cache", "precompute.lock")
+LOCK_STALE_SECONDS = 15 * 60
+TOP_K = 8
+
+def _acquire_lock():
+    """Create the lock file; False if another fresh run holds it"""
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    if os.path.exists(LOCK_FILE) and time.time() - os.path.getmtime(LOCK_FILE) > LOCK_STALE_SECONDS:
+        os.remove(LOCK_FILE)
+    try:
+        fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return True
+    except FileExistsError:
+        return False
+
+def _release_lock():
+    try:
+        os.remove(LOCK_FILE)
+    except OSError:
+        pass
+
+def read_current_kb():
+    """Sections and version of the published KB"""
+    with open(CURRENT_KB_FILE, 'r', encoding='utf-8') as f:
+        kb_data = json.load(f)
+    return kb_sections(kb_data), get_kb_version(kb_to_text(kb_data))
+
+def _precompute_version(sections, kb_version, api_key, model):
+    """Fill in missing answers for one KB version; returns the model used"""
+    questions = load_canonical_questions()
+    store = load_precomputed_answers()
+    if store.get("kb_version") != kb_version:
+        store = {"kb_version": kb_version, "answers": {}}
+    pending = [q for q in questions if normalize_query(q["query"]) not in store["answers"]]
+    if not pending:
+        logger.info("Precomputed answers for KB %s are up to date", kb_version)
+        return model
+
+    # Heavy imports only when there is work to do
+    from retrieval import KBIndex
+    from embeddings import EmbeddingCache
+    from embedding_backends import embedding_cache_name
+    from model_router import get_router
+    if model is None:
+        from embedding_backends import load_embedding_backend
+        model, timings = load_embedding_backend()
+        logger.info("Embedding model loaded in %.2fs", sum(timings.values()))
+
+    docs = build_documents(sections, model, cache=EmbeddingCache(embedding_cache_name(model)))
+    index = KBIndex(docs, version=kb_version)
+    router = get_router()
+
+    for question in pending:
+        query = question["query"]
+        try:
+            query_embedding = encode_query(query, model)
+            relevant_docs = index.search(query, query_embedding, top_k=TOP_K)
+            if COMPRESSION_ENABLED:
+                relevant_docs = compress_docs(relevant_docs, query_embedding)
+            answer = router.generate(build_prompt(query, relevant_docs), api_key)
+        except Exception as e:
+            logger.warning("Could not precompute answer for %r: %s", query, e)
+            continue
+        store["answers"][normalize_query(query)] = {
+            "query": query,
+            "answer": answer,
+            "generated_at": datetime.now().isoformat()
+        }
+        # Save after each answer so buttons benefit before the run finishes
+        save_precomputed_answers(store)
+        logger.info("Precomputed answer for %r (KB %s)", query, kb_version)
+    return model
+
+def precompute_answers(api_key=None, model=None):
+    """Answer every canonical question against the current KB version"""
+    api_key = api_key or os.getenv("GEMINI_API_KEY", "")
+    if not api_key:
+        logger.warning("GEMINI_API_KEY not set; skipping answer precompute")
+        return False
+    if not os.path.exists(CURRENT_KB_FILE):
+        logger.warning("%s not found; skipping answer precompute", CURRENT_KB_FILE)
+        return False
+    if not _acquire_lock():
+        logger.info("Answer precompute already running; skipping")
+        return False
+
+    try:
+        done_version = None
+        sections, kb_version = read_current_kb()
+        # A publish during the run is skipped by its own trigger (lock held),
+        # so keep going until the version we answered is still the current one
+        while kb_version != done_version:
+            model = _precompute_version(sections, kb_version, api_key, model)
+            done_version = kb_version
+            sections, kb_version = read_current_kb()
+        return True
+    finally:
+        _release_lock()
+
+def trigger_precompute(api_key=None):
+    """Start answer precompute in a background process (returns immediately)"""
+    env = dict(os.environ)
+    if api_key:
+        env["GEMINI_API_KEY"] = api_key
+    try:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        return True
+    except OSError as e:
+        logger.warning("Could not start answer precompute: %s", e)
+        return False
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(name)s: %(message)s")
+    sys.exit(0 if precompute_answers() else 1)
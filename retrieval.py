@@ -0,0 +1,215 @@
+"""
+Retrieval Engine for PITUTUR-Wicara
+Vectorized hybrid (semantic + keyword) search over knowledge base chunks
+"""
+
+import numpy as np
+
+from chunk_store import tokenize
+from ann_index import load_or_build_ivf, ANN_NPROBE
+from embedding_store import EmbeddingStore, rescore_path
+
+# Scoring weights (same scale as the original per-chunk loop)
+SEMANTIC_WEIGHT = 100.0  # cosine similarity scaled to 0-100
+KEYWORD_WEIGHT = 2.0     # per unit of BM25 score
+PHRASE_BOOST = 10.0      # exact query phrase found in chunk
+MIN_PHRASE_LENGTH = 4
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+def normalize_rows(matrix):
+    """L2-normalize each row of a matrix, leaving zero rows untouched"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k_indices(scores, top_k, candidates=None):
+    """Return indices of the top_k highest scores, best first"""
+    if candidates is None:
+        candidates = np.arange(len(scores))
+    if len(candidates) == 0 or top_k <= 0:
+        return candidates[:0]
+    candidate_scores = scores[candidates]
+    if len(candidates) > top_k:
+        # Keep everything tied with the k-th score so ties resolve by chunk order
+        part = np.argpartition(-candidate_scores, top_k - 1)
+        kth_score = candidate_scores[part[top_k - 1]]
+        keep = candidate_scores >= kth_score
+        candidates = candidates[keep]
+        candidate_scores = candidate_scores[keep]
+    order = np.lexsort((candidates, -candidate_scores))[:top_k]
+    return candidates[order]
+
+class BM25Index:
+    """Inverted index with BM25 scoring and a positional phrase index"""
+
+    def __init__(self, store, k1=BM25_K1, b=BM25_B):
+        self.size = len(store)
+        token_ids = np.asarray(store.token_ids, dtype=np.int64)
+        doc_lengths = np.diff(store.token_offsets).astype(np.float32)
+        doc_of_token = np.repeat(np.arange(self.size, dtype=np.int64), doc_lengths.astype(np.int64))
+        # Gap of one position per chunk so a phrase never spans two chunks
+        global_positions = np.arange(len(token_ids), dtype=np.int64) + doc_of_token
+        doc_starts = store.token_offsets[:-1].astype(np.int64) + np.arange(self.size, dtype=np.int64)
+
+        avgdl = float(doc_lengths.mean()) if self.size else 0.0
+        if avgdl > 0:
+            length_norm = k1 * (1 - b + b * doc_lengths / avgdl)
+        else:
+            length_norm = np.full(self.size, k1, dtype=np.float32)
+
+        # Term frequencies per (term, chunk) pair, grouped by term
+        vocab_size = len(store.vocab)
+        pairs, tf = np.unique(token_ids * max(1, self.size) + doc_of_token, return_counts=True)
+        pair_terms = pairs // max(1, self.size)
+        pair_docs = (pairs % max(1, self.size)).astype(np.int32)
+        term_bounds = np.searchsorted(pair_terms, np.arange(vocab_size + 1))
+
+        # Precompute each posting's BM25 weight so a query is a gather-add per term
+        tf = tf.astype(np.float32)
+        df = np.diff(term_bounds).astype(np.float32)
+        idf = np.log(1.0 + (self.size - df + 0.5) / (df + 0.5))
+        weights = (idf[pair_terms] * tf * (k1 + 1) / (tf + length_norm[pair_docs])).astype(np.float32)
+
+        position_order = np.argsort(token_ids, kind="stable")
+        position_bounds = np.searchsorted(token_ids[position_order], np.arange(vocab_size + 1))
+        sorted_positions = global_positions[position_order]
+
+        self.postings = {}
+        self.positions = {}
+        for term_id, term in enumerate(store.vocab):
+            lo, hi = term_bounds[term_id], term_bounds[term_id + 1]
+            self.postings[term] = (pair_docs[lo:hi], weights[lo:hi])
+            self.positions[term] = sorted_positions[position_bounds[term_id]:position_bounds[term_id + 1]]
+        self.doc_lengths = doc_lengths
+        self.doc_starts = doc_starts
+
+    def doc_freq(self, term):
+        """Number of chunks containing a term"""
+        entry = self.postings.get(term)
+        return 0 if entry is None else len(entry[0])
+
+    def freeze(self):
+        """Mark all index arrays read-only"""
+        for ids, weights in self.postings.values():
+            ids.flags.writeable = False
+            weights.flags.writeable = False
+        for pos in self.positions.values():
+            pos.flags.writeable = False
+        self.doc_lengths.flags.writeable = False
+        self.doc_starts.flags.writeable = False
+
+    def score(self, terms):
+        """BM25 score of every chunk for the given query terms"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(terms):
+            entry = self.postings.get(term)
+            if entry is not None:
+                ids, weights = entry
+                scores[ids] += weights
+        return scores
+
+    def phrase_matches(self, terms):
+        """Boolean mask of chunks containing the terms as a consecutive phrase"""
+        mask = np.zeros(self.size, dtype=bool)
+        if not terms or terms[0] not in self.positions:
+            return mask
+        starts = self.positions[terms[0]]
+        for offset, term in enumerate(terms[1:], start=1):
+            following = self.positions.get(term)
+            if following is None:
+                return mask
+            starts = starts[np.isin(starts + offset, following, assume_unique=True)]
+            if len(starts) == 0:
+                return mask
+        mask[np.searchsorted(self.doc_starts, starts, side="right") - 1] = True
+        return mask
+
+class KBIndex:
+    """Immutable search index over knowledge base chunks"""
+
+    def __init__(self, store, version=None, nprobe=ANN_NPROBE, precision=None):
+        self.documents = store  # ChunkStore; indexing yields ChunkRecord views
+        self.version = version
+        self.size = len(store)
+        matrix = None if store.embeddings is None else normalize_rows(store.embeddings)
+        # Optional ANN index for large corpora (None = exact search)
+        self.ann = load_or_build_ivf(matrix, version)
+        # Compact (int8) copy used for scoring; see embedding_store.py
+        self.embeddings = None if matrix is None else EmbeddingStore(
+            matrix, precision, rescore_file=rescore_path(version) if version else None
+        )
+        # The embedding store owns the vectors now
+        store.release_embeddings()
+        self.nprobe = nprobe
+        self.bm25 = BM25Index(store)
+        self._freeze()
+
+    def _freeze(self):
+        """Mark index arrays read-only; one instance is shared by all sessions"""
+        self.documents.freeze()
+        if self.embeddings is not None:
+            self.embeddings.freeze()
+        if self.ann is not None:
+            for array in (self.ann.centroids, self.ann.order, self.ann.offsets):
+                array.flags.writeable = False
+        self.bm25.freeze()
+
+    def semantic_scores(self, query_embedding):
+        """Cosine similarity of the query against every chunk (single matmul)"""
+        if self.embeddings is None or query_embedding is None:
+            return None
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        query = query / norm
+        if self.ann is None:
+            return self.embeddings.scores(query)
+
+        # ANN: only chunks in the probed lists get a semantic score
+        scores = np.zeros(self.size, dtype=np.float32)
+        ids = self.ann.candidates(query, self.nprobe)
+        scores[ids] = self.embeddings.scores(query, ids)
+        return scores
+
+    def score(self, query, query_embedding=None):
+        """Hybrid score of every chunk for a query"""
+        terms = tokenize(query)
+        scores = self.bm25.score(terms) * KEYWORD_WEIGHT
+
+        semantic = self.semantic_scores(query_embedding)
+        if semantic is not None:
+            scores += semantic * SEMANTIC_WEIGHT
+
+        if len(query) >= MIN_PHRASE_LENGTH:
+            scores[self.bm25.phrase_matches(terms)] += PHRASE_BOOST
+
+        return scores
+
+    def search(self, query, query_embedding=None, top_k=5):
+        """Return the top_k most relevant chunks for a query, best first"""
+        if self.size == 0:
+            return []
+        scores = self.score(query, query_embedding)
+        candidates = np.flatnonzero(scores > 0)
+        if self.embeddings is not None and self.embeddings.can_rescore and query_embedding is not None:
+            candidates = self._rescore(scores, candidates, query_embedding, top_k)
+        ids = top_k_indices(scores, top_k, candidates)
+        return [self.documents[i] for i in ids]
+
+    def _rescore(self, scores, candidates, query_embedding, top_k):
+        """Replace quantized semantic scores of the best candidates with float32 ones"""
+        ids = top_k_indices(scores, max(top_k, self.embeddings.rescore_candidates), candidates)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+        probed = ids
+        if self.ann is not None:
+            # Chunks outside the probed lists had no semantic score to correct
+            probed = ids[np.isin(ids, self.ann.candidates(query, self.nprobe))]
+        correction = self.embeddings.exact_scores(query, probed) - self.embeddings.scores(query, probed)
+        scores[probed] += correction * SEMANTIC_WEIGHT
+        return ids
@@ -10,6 +10,10 @@ import requests
 from bs4 import BeautifulSoup
 import sys
 
+from precompute_answers import trigger_precompute
+from kb_store import get_kb_store
+from version_store import get_version_store
+
 KNOWLEDGE_BASE_DIR = "knowledge_base"
 SYNC_CONFIG_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "sync_config.json")
 CURRENT_KB_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "current_knowledge.json")
@@ -63,12 +67,7 @@ def fetch_content(url):
 def update_knowledge_base(url_contents):
     """Update knowledge base with fetched content"""
     try:
-        # Load current KB
-        if os.path.exists(CURRENT_KB_FILE):
-            with open(CURRENT_KB_FILE, 'r', encoding='utf-8') as f:
-                kb_data = json.load(f)
-        else:
-            kb_data = {"sections": [], "version": "1.0.0"}
+        store = get_kb_store()
         
         # Add synced content as new sections
         for url, content in url_contents.items():
@@ -82,27 +81,30 @@ def update_knowledge_base(url_contents):
                     "auto_synced": True
                 }
                 
-                # Check if section already exists and update
-                existing_idx = None
-                for idx, sec in enumerate(kb_data["sections"]):
-                    if sec.get("source_url") == url and sec.get("auto_synced"):
-                        existing_idx = idx
-                        break
+                # Update the existing section for this URL (one transaction each)
+                _, replaced = store.upsert_section(section, keys=("source_url", "auto_synced"))
                 
-                if existing_idx is not None:
-                    kb_data["sections"][existing_idx] = section
+                if replaced:
                     log_message(f"Updated existing section from {url}")
                 else:
-                    kb_data["sections"].append(section)
                     log_message(f"Added new section from {url}")
         
-        # Save updated KB
-        kb_data["last_updated"] = datetime.now().isoformat()
-        
-        with open(CURRENT_KB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(kb_data, f, indent=2, ensure_ascii=False)
+        # Record a version only if a section body changed (synced_at alone does not count)
+        synced = [url for url, content in url_contents.items() if content]
+        version = get_version_store().commit(
+            store.load(), f"Auto-synced {len(synced)} URL(s)", source="sync", skip_unchanged=True
+        )
+        if version is None:
+            log_message("No section content changed; no new version recorded")
+            store.set_meta(last_updated=datetime.now().isoformat())
+        else:
+            store.set_meta(last_updated=datetime.now().isoformat(), version=version["version"])
         
         log_message(f"Knowledge base updated successfully")
+        
+        # Precompute example-question answers for the new version in the background
+        if trigger_precompute():
+            log_message("Started answer precompute for example questions")
         return True
         
     except Exception as e:
@@ -0,0 +1,10 @@
+"""
+Text Utilities for PITUTUR-Wicara
+Query normalization shared by the query-embedding and answer caches
+"""
+
+import re
+
+def normalize_query(query):
+    """Case/whitespace/punctuation-insensitive form of a question"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
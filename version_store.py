@@ -0,0 +1,435 @@
+"""
+Knowledge Base Version Store for PITUTUR-Wicara
+Content-addressed, compressed section bodies with per-version manifests
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import difflib
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from kb_pipeline import KNOWLEDGE_BASE_DIR
+from kb_store import file_lock
+from file_utils import atomic_write, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_FILE = os.path.join(KNOWLEDGE_BASE_DIR, "versions.json")
+VERSION_STORE_DIR = os.path.join(KNOWLEDGE_BASE_DIR, "versions")
+# Keep this many most recent versions (0 = keep all); older ones are pruned
+KB_VERSION_RETENTION = int(os.getenv("KB_VERSION_RETENTION", "200"))
+MANIFEST_FORMAT = 1
+BLOB_CACHE_SIZE = 4096
+DIFF_CACHE_SIZE = 64
+DIFF_CONTEXT_LINES = 2
+
+LEGACY_FILE_PATTERN = re.compile(r"^version_\d+_[0-9a-f]+\.json$")
+
+def content_hash(kb_data):
+    """Short version hash of the KB (same scheme as the legacy snapshots)"""
+    return hashlib.md5(json.dumps(kb_data, sort_keys=True).encode()).hexdigest()[:8]
+
+def blob_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def section_key(section):
+    """Identity of a section across versions (sync URL, else title)"""
+    return section.get("source_url") or section.get("title", "")
+
+def keyed_sections(sections):
+    """{(key, occurrence): section} so repeated titles still pair up in order"""
+    keyed, seen = {}, {}
+    for section in sections:
+        key = section_key(section)
+        seen[key] = seen.get(key, 0) + 1
+        keyed[(key, seen[key])] = section
+    return keyed
+
+def match_sections(old_sections, new_sections):
+    """Pair manifest sections of two versions: (pairs, added, removed).
+
+    Sections pair up by key; leftovers with the same body hash are
+    treated as renames rather than a removal plus an addition.
+    """
+    old, new = keyed_sections(old_sections), keyed_sections(new_sections)
+    pairs = [(old[key], section) for key, section in new.items() if key in old]
+    added = [section for key, section in new.items() if key not in old]
+    removed = [section for key, section in old.items() if key not in new]
+
+    removed_by_hash = {}
+    for section in removed:
+        removed_by_hash.setdefault(section["content"], []).append(section)
+    still_added = []
+    for section in added:
+        candidates = removed_by_hash.get(section["content"])
+        if candidates:
+            previous = candidates.pop(0)
+            removed.remove(previous)
+            pairs.append((previous, section))
+        else:
+            still_added.append(section)
+    return pairs, still_added, removed
+
+def summarize_changes(old_sections, new_sections):
+    """Titles of added, removed and modified sections between two manifests"""
+    pairs, added, removed = match_sections(old_sections, new_sections)
+    return {
+        "added": [section.get("title", "") for section in added],
+        "removed": [section.get("title", "") for section in removed],
+        "modified": [
+            new.get("title", "") for old, new in pairs
+            if (old["content"], old.get("title")) != (new["content"], new.get("title"))
+        ]
+    }
+
+class VersionStore:
+    """Version history where each distinct section body is stored once.
+
+    A version is a small manifest: top-level KB fields plus every section
+    with its `content` replaced by the sha256 of the body. Bodies live in
+    zlib-compressed blobs named by that hash, so unchanged sections (and
+    re-synced pages with identical text) cost nothing per version. Legacy
+    full-snapshot files (version_N_hash.json with "data") stay readable.
+    """
+
+    def __init__(self, base_dir=KNOWLEDGE_BASE_DIR, store_dir=VERSION_STORE_DIR,
+                 versions_file=VERSIONS_FILE, retention=KB_VERSION_RETENTION):
+        self.base_dir = base_dir
+        self.store_dir = store_dir
+        self.versions_file = versions_file
+        self.retention = retention
+        self.manifest_dir = os.path.join(store_dir, "manifests")
+        self.blob_dir = os.path.join(store_dir, "blobs")
+        self.lock_file = os.path.join(store_dir, ".lock")
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        # Blobs and manifests are immutable, so cached bodies and diffs never go stale
+        self.read_blob = lru_cache(maxsize=BLOB_CACHE_SIZE)(self._read_blob)
+        self._diff_cached = lru_cache(maxsize=DIFF_CACHE_SIZE)(self._diff)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest + ".z")
+
+    def write_blob(self, text):
+        """Store a section body once; returns its hash"""
+        digest = blob_hash(text)
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            data = zlib.compress(text.encode('utf-8'), 6)
+            atomic_write(path, lambda f: f.write(data))
+        return digest
+
+    def _read_blob(self, digest):
+        with open(self._blob_path(digest), 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8')
+
+    def load_versions(self):
+        """Version index (oldest first)"""
+        if os.path.exists(self.versions_file):
+            with open(self.versions_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return []
+
+    def resolve(self, version_file):
+        """Locate a version file inside this store (index entries may hold Windows-style paths)"""
+        name = os.path.basename(version_file.replace("\\", "/"))
+        for directory in (self.manifest_dir, self.base_dir):
+            candidate = os.path.join(directory, name)
+            if os.path.exists(candidate):
+                return candidate
+        raise FileNotFoundError(version_file)
+
+    def commit(self, kb_data, commit_message="", source="admin", skip_unchanged=False):
+        """Record kb_data as a new version; returns its index entry.
+
+        With skip_unchanged, nothing is recorded (and None is returned) when
+        no section was added, removed, retitled or changed its body, so
+        metadata-only churn such as synced_at does not fill the retention.
+        """
+        version_hash = content_hash(kb_data)
+        # Blobs are written under the lock so a concurrent gc cannot drop them
+        with file_lock(self.lock_file):
+            sections = [
+                dict(section, content=self.write_blob(section.get("content", "")))
+                for section in kb_data.get("sections", [])
+            ]
+            versions = self.load_versions()
+            previous = self._manifest_sections(versions[-1]) if versions else []
+            summary = self._summary(kb_data.get("sections", []), sections, previous, source)
+            if skip_unchanged and versions and not any(summary["changes"].values()):
+                return None
+            version_number = _next_version_number(versions)
+            manifest = {
+                "format": MANIFEST_FORMAT,
+                "version": f"{version_number}.0.0",
+                "hash": version_hash,
+                "timestamp": datetime.now().isoformat(),
+                "commit_message": commit_message,
+                "meta": {key: value for key, value in kb_data.items() if key != "sections"},
+                "sections": sections
+            }
+            manifest_file = os.path.join(self.manifest_dir, f"version_{version_number}_{version_hash}.json")
+            write_json_atomic(manifest_file, manifest)
+
+            entry = {
+                "version": manifest["version"],
+                "hash": version_hash,
+                "timestamp": manifest["timestamp"],
+                "commit_message": commit_message,
+                "file": manifest_file,
+                **summary
+            }
+            versions.append(entry)
+            pruned = []
+            if self.retention and len(versions) > self.retention:
+                pruned, versions = versions[:-self.retention], versions[-self.retention:]
+            write_json_atomic(self.versions_file, versions)
+            if pruned:
+                self._remove_versions(pruned)
+                self._gc(versions)
+        return entry
+
+    @staticmethod
+    def _summary(full_sections, sections, previous, source):
+        """Index metadata so the history list never opens manifests"""
+        return {
+            "source": source,
+            "sections": len(sections),
+            "size": sum(len(section.get("content", "").encode('utf-8')) for section in full_sections),
+            "changes": summarize_changes(previous, sections)
+        }
+
+    def _manifest_sections(self, entry):
+        """Sections of a version with content as body hash (any file format)"""
+        try:
+            return self._sections_and_bodies(entry["file"])[0]
+        except FileNotFoundError:
+            return []
+
+    def _sections_and_bodies(self, version_file):
+        """(sections with content as body hash, hash -> body lookup)"""
+        manifest = self.load_manifest(version_file)
+        if "data" not in manifest:
+            return manifest["sections"], self.read_blob
+        bodies, sections = {}, []
+        for section in manifest["data"].get("sections", []):
+            digest = blob_hash(section.get("content", ""))
+            bodies[digest] = section.get("content", "")
+            sections.append(dict(section, content=digest))
+        return sections, bodies.__getitem__
+
+    def reindex(self):
+        """Fill summary metadata for index entries written before it existed"""
+        if all("changes" in entry for entry in self.load_versions()):
+            return 0
+        updated = 0
+        with file_lock(self.lock_file):
+            versions = self.load_versions()
+            previous = []
+            for entry in versions:
+                sections = self._manifest_sections(entry)
+                if "changes" not in entry:
+                    full = self.load_version(entry["file"]).get("sections", []) if sections else []
+                    source = "sync" if entry.get("commit_message", "").startswith("Auto-synced") else "admin"
+                    entry.update(self._summary(full, sections, previous, source))
+                    updated += 1
+                previous = sections
+            if updated:
+                write_json_atomic(self.versions_file, versions)
+        return updated
+
+    def diff(self, old_file, new_file):
+        """Section-level diff between two versions (cached per pair).
+
+        Returns {"added": [section], "removed": [section], "modified":
+        [{"title", "old_title", "diff", "fields"}]}. Sections with equal
+        body hashes are never text-diffed; only modified bodies are read.
+        """
+        return self._diff_cached(os.path.basename(self.resolve(old_file)), os.path.basename(self.resolve(new_file)))
+
+    def _diff(self, old_name, new_name):
+        old_sections, old_body = self._sections_and_bodies(old_name)
+        new_sections, new_body = self._sections_and_bodies(new_name)
+        pairs, added, removed = match_sections(old_sections, new_sections)
+
+        result = {
+            "added": [dict(section, content=new_body(section["content"])) for section in added],
+            "removed": [dict(section, content=old_body(section["content"])) for section in removed],
+            "modified": []
+        }
+        for previous, section in pairs:
+            fields = sorted(
+                field for field in set(previous) | set(section)
+                if field != "content" and previous.get(field) != section.get(field)
+            )
+            if previous["content"] == section["content"] and "title" not in fields:
+                continue  # unchanged body: skipped by hash
+            diff = []
+            if previous["content"] != section["content"]:
+                diff = list(difflib.unified_diff(
+                    old_body(previous["content"]).splitlines(), new_body(section["content"]).splitlines(),
+                    fromfile=old_name, tofile=new_name, n=DIFF_CONTEXT_LINES, lineterm=""
+                ))
+            result["modified"].append({
+                "title": section.get("title", ""),
+                "old_title": previous.get("title", ""),
+                "diff": diff,
+                "fields": fields
+            })
+        return result
+
+    def load_manifest(self, version_file):
+        with open(self.resolve(version_file), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_version(self, version_file):
+        """Full KB data of a version (manifest or legacy snapshot)"""
+        manifest = self.load_manifest(version_file)
+        if "data" in manifest:
+            return manifest["data"]
+        kb_data = dict(manifest.get("meta", {}))
+        kb_data["sections"] = [
+            dict(section, content=self.read_blob(section["content"]))
+            for section in manifest["sections"]
+        ]
+        return kb_data
+
+    def _remove_versions(self, entries):
+        for entry in entries:
+            try:
+                os.remove(self.resolve(entry["file"]))
+            except FileNotFoundError:
+                pass
+        logger.info("Pruned %d old KB versions", len(entries))
+
+    def _gc(self, versions):
+        """Delete blobs no remaining manifest refers to (call under the lock)"""
+        live = set()
+        for entry in versions:
+            try:
+                manifest = self.load_manifest(entry["file"])
+            except FileNotFoundError:
+                continue
+            if "data" not in manifest:
+                live.update(section["content"] for section in manifest["sections"])
+        removed = 0
+        for prefix in os.listdir(self.blob_dir):
+            prefix_dir = os.path.join(self.blob_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                if name.split(".", 1)[0] not in live:
+                    os.remove(os.path.join(prefix_dir, name))
+                    removed += 1
+        if removed:
+            self.read_blob.cache_clear()
+            self._diff_cached.cache_clear()
+            logger.info("Removed %d unreferenced section blobs", removed)
+        return removed
+
+    def prune(self, keep=None):
+        """Apply the retention policy now and collect garbage; returns pruned entries"""
+        keep = self.retention if keep is None else keep
+        with file_lock(self.lock_file):
+            versions = self.load_versions()
+            pruned = []
+            if keep and len(versions) > keep:
+                pruned, versions = versions[:-keep], versions[-keep:]
+                write_json_atomic(self.versions_file, versions)
+                self._remove_versions(pruned)
+            self._gc(versions)
+        return pruned
+
+    def migrate_legacy(self):
+        """Convert full-snapshot version files to manifests; returns the count"""
+        migrated = 0
+        with file_lock(self.lock_file):
+            versions = self.load_versions()
+            for entry in versions:
+                try:
+                    legacy_file = self.resolve(entry["file"])
+                except FileNotFoundError:
+                    continue
+                with open(legacy_file, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                if "data" not in snapshot:
+                    continue
+                kb_data = snapshot["data"]
+                manifest = {
+                    "format": MANIFEST_FORMAT,
+                    "version": snapshot["version"],
+                    "hash": snapshot["hash"],
+                    "timestamp": snapshot["timestamp"],
+                    "commit_message": snapshot.get("commit_message", ""),
+                    "meta": {key: value for key, value in kb_data.items() if key != "sections"},
+                    "sections": [
+                        dict(section, content=self.write_blob(section.get("content", "")))
+                        for section in kb_data.get("sections", [])
+                    ]
+                }
+                manifest_file = os.path.join(self.manifest_dir, os.path.basename(legacy_file))
+                write_json_atomic(manifest_file, manifest)
+                entry["file"] = manifest_file
+                write_json_atomic(self.versions_file, versions)
+                os.remove(legacy_file)
+                migrated += 1
+        return migrated
+
+    def disk_usage(self):
+        """Bytes used by manifests, blobs and the version index"""
+        total = os.path.getsize(self.versions_file) if os.path.exists(self.versions_file) else 0
+        for root, _, files in os.walk(self.store_dir):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        for name in os.listdir(self.base_dir):
+            if LEGACY_FILE_PATTERN.match(name):
+                total += os.path.getsize(os.path.join(self.base_dir, name))
+        return total
+
+def _next_version_number(versions):
+    """Numbers keep increasing after pruning (len(versions) + 1 would repeat)"""
+    if not versions:
+        return 1
+    try:
+        return int(str(versions[-1]["version"]).split(".")[0]) + 1
+    except ValueError:
+        return len(versions) + 1
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_version_store():
+    """Return the process-wide version store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VersionStore()
+                _store.reindex()
+    return _store
+
+def main():
+    parser = argparse.ArgumentParser(description="KB version store maintenance")
+    parser.add_argument("command", choices=["migrate", "reindex", "prune", "stats"])
+    parser.add_argument("--keep", type=int, default=None, help="versions to keep (prune)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    store = get_version_store()
+    before = store.disk_usage()
+    if args.command == "migrate":
+        print(f"Migrated {store.migrate_legacy()} legacy snapshots")
+    elif args.command == "reindex":
+        print(f"Indexed {store.reindex()} versions")
+    elif args.command == "prune":
+        print(f"Pruned {len(store.prune(args.keep))} versions")
+    print(f"Versions: {len(store.load_versions())}, disk: {before / 1024:.1f} KB -> {store.disk_usage() / 1024:.1f} KB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())